@@ -68,6 +68,23 @@ if __name__ == "__main__":
     dropdb_parser = subparsers.add_parser(
         'dropdb', help='drop application database'
     )
+    migrate_parser = subparsers.add_parser(
+        'migrate', help='upgrade application database schema'
+    )
+    migrate_parser.add_argument(
+        'revision', action='store', nargs='?', default='head',
+        help='revision to upgrade to, the latest one by default'
+    )
+    downgrade_parser = subparsers.add_parser(
+        'downgrade', help='downgrade application database schema'
+    )
+    downgrade_parser.add_argument(
+        'revision', action='store',
+        help='revision to downgrade to, e.g. -1 for previous one'
+    )
+    current_parser = subparsers.add_parser(
+        'current', help='show revision of application database schema'
+    )
     shell_parser = subparsers.add_parser(
         'shell', help='open python REPL'
     )
@@ -119,6 +136,19 @@ if __name__ == "__main__":
         from nailgun.db import dropdb
         dropdb()
         logger.info("Done")
+    elif params.action == "migrate":
+        logger.info("Upgrading database schema...")
+        from nailgun.db import migrate
+        migrate(params.revision)
+        logger.info("Done")
+    elif params.action == "downgrade":
+        logger.info("Downgrading database schema...")
+        from nailgun.db import downgrade
+        downgrade(params.revision)
+        logger.info("Done")
+    elif params.action == "current":
+        from nailgun.db import current_revision
+        sys.stdout.write("%s\n" % current_revision())
     elif params.action == "test":
         logger.info("Running tests...")
         from nailgun.unit_test import TestRunner
@@ -14,21 +14,252 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
-import json
+from copy import deepcopy
+import importlib
 
+from sqlalchemy import event
+from sqlalchemy.ext.mutable import Mutable
 import sqlalchemy.types as types
 
+from nailgun.logger import logger
+from nailgun.settings import settings
+
+
+def load_codec(name):
+    """Returns module with dumps and loads functions used
+    to serialize JSON columns, stdlib json if it can't be imported
+
+    :param name: module name, e.g. simplejson
+    """
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        logger.warning("JSON codec %r can't be imported, "
+                       "json is used instead", name)
+        return importlib.import_module('json')
+
+
+codec = load_codec(settings.JSON_CODEC)
+
+
+class TrackedJSON(Mutable):
+    """Base of containers which track in-place changes of JSON
+    column values. Nested containers report changes to the root
+    one, which flags column of its parents as modified. Root
+    container keeps serialized value until it's changed.
+
+    Only loaded dicts and lists are tracked. Assigned values,
+    including ones put into tracked containers, are stored as is,
+    so the caller may keep changing them until flush, as with
+    untracked columns.
+    """
+
+    # root container, None for root itself
+    _root = None
+    # serialized value of root container
+    _json = None
+
+    @classmethod
+    def coerce(cls, key, value):
+        return value
+
+    @classmethod
+    def associate_with_attribute(cls, attribute):
+        """Establishes parents of tracked values of attribute.
+        Unlike Mutable, values which aren't tracked (scalars and
+        assigned containers) are left alone.
+        """
+        key = attribute.key
+
+        def load(state, *args):
+            value = state.dict.get(key)
+            if isinstance(value, TrackedJSON):
+                value._parents[state.obj()] = key
+
+        def set(target, value, oldvalue, initiator):
+            if isinstance(oldvalue, TrackedJSON):
+                oldvalue._parents.pop(target.obj(), None)
+            if isinstance(value, TrackedJSON):
+                value._parents[target.obj()] = key
+            return value
+
+        event.listen(attribute.class_, 'load', load,
+                     raw=True, propagate=True)
+        event.listen(attribute.class_, 'refresh', load,
+                     raw=True, propagate=True)
+        event.listen(attribute, 'set', set,
+                     raw=True, retval=True, propagate=True)
+
+    @property
+    def root(self):
+        return self if self._root is None else self._root
+
+    def changed(self):
+        root = self.root
+        root._json = None
+        Mutable.changed(root)
+
+    def __reduce_ex__(self, protocol):
+        # copies and pickles are plain containers
+        return deepcopy(self).__reduce_ex__(protocol)
+
+
+class TrackedDict(TrackedJSON, dict):
+
+    def __deepcopy__(self, memo):
+        return dict(
+            (deepcopy(k, memo), deepcopy(v, memo))
+            for k, v in self.iteritems()
+        )
+
+    def __setitem__(self, key, value):
+        dict.__setitem__(self, key, value)
+        self.changed()
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        self.changed()
+
+    def clear(self):
+        dict.clear(self)
+        self.changed()
+
+    def pop(self, *args):
+        result = dict.pop(self, *args)
+        self.changed()
+        return result
+
+    def popitem(self):
+        result = dict.popitem(self)
+        self.changed()
+        return result
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return dict.__getitem__(self, key)
+
+    def update(self, *args, **kwargs):
+        dict.update(self, *args, **kwargs)
+        self.changed()
+
+
+class TrackedList(TrackedJSON, list):
+
+    def __deepcopy__(self, memo):
+        return [deepcopy(v, memo) for v in self]
+
+    def __setitem__(self, index, value):
+        list.__setitem__(self, index, value)
+        self.changed()
+
+    def __setslice__(self, i, j, values):
+        self[max(0, i):max(0, j):] = values
+
+    def __delitem__(self, index):
+        list.__delitem__(self, index)
+        self.changed()
+
+    def __delslice__(self, i, j):
+        del self[max(0, i):max(0, j):]
+
+    def __iadd__(self, values):
+        self.extend(values)
+        return self
+
+    def __imul__(self, n):
+        list.__imul__(self, n)
+        self.changed()
+        return self
+
+    def append(self, value):
+        list.append(self, value)
+        self.changed()
+
+    def extend(self, values):
+        list.extend(self, values)
+        self.changed()
+
+    def insert(self, index, value):
+        list.insert(self, index, value)
+        self.changed()
+
+    def pop(self, *args):
+        result = list.pop(self, *args)
+        self.changed()
+        return result
+
+    def remove(self, value):
+        list.remove(self, value)
+        self.changed()
+
+    def reverse(self):
+        list.reverse(self)
+        self.changed()
+
+    def sort(self, *args, **kwargs):
+        list.sort(self, *args, **kwargs)
+        self.changed()
+
+
+def track(value, root=None):
+    """Returns copy of loaded JSON value with dicts and lists
+    replaced by tracked containers, other values are returned as is
+
+    :param value: JSON value
+    :param root: root container, new root is created if not given
+    """
+    if isinstance(value, dict):
+        tracked = TrackedDict()
+        items = value.iteritems()
+    elif isinstance(value, list):
+        tracked = TrackedList()
+        items = enumerate(value)
+    else:
+        return value
+    tracked._root = root
+    if root is None:
+        root = tracked
+    if isinstance(tracked, TrackedDict):
+        dict.update(tracked, ((k, track(v, root)) for k, v in items))
+    else:
+        list.extend(tracked, [track(v, root) for k, v in items])
+    return tracked
+
 
 class JSON(types.TypeDecorator):
+    """JSON column serialized with configurable codec (JSON_CODEC).
+    Dicts and lists are loaded as tracked containers, so in-place
+    changes are written back, and unchanged values are neither
+    compared deeply nor serialized again.
+    """
 
     impl = types.Text
 
     def process_bind_param(self, value, dialect):
-        if value is not None:
-            value = json.dumps(value)
-        return value
+        if value is None:
+            return value
+        if isinstance(value, TrackedJSON) and value._json is not None:
+            return value._json
+        return codec.dumps(value)
 
     def process_result_value(self, value, dialect):
-        if value is not None:
-            value = json.loads(value)
-        return value
+        if value is None:
+            return value
+        result = track(codec.loads(value))
+        if isinstance(result, TrackedJSON):
+            result._json = value
+        return result
+
+    def compare_values(self, x, y):
+        if x is y:
+            # in-place changes are flagged by tracked containers
+            return True
+        x_json = getattr(x, '_json', None)
+        y_json = getattr(y, '_json', None)
+        if x_json is not None and y_json is not None:
+            return x_json == y_json
+        return x == y
+
+
+TrackedJSON.associate_with(JSON)
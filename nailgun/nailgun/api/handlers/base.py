@@ -58,7 +58,7 @@ def content_json(func, *args, **kwargs):
 
 def build_json_response(data):
     web.header('Content-Type', 'application/json')
-    if type(data) in (dict, list):
+    if isinstance(data, (dict, list)):
         return json.dumps(data, indent=4)
     return data
 
@@ -18,11 +18,13 @@
 Handlers dealing with logs
 """
 
+import datetime
 from itertools import dropwhile
 import json
 import logging
 import os
 import re
+import threading
 import time
 
 import web
@@ -40,34 +42,312 @@ logger = logging.getLogger(__name__)
 
 
 def read_backwards(file, bufsize=4096):
-    buf = ""
-    try:
-        file.seek(-1, 1)
-    except IOError:
-        return
-    trailing_newline = False
-    if file.read(1) == "\n":
-        trailing_newline = True
-        file.seek(-1, 1)
-
-    while True:
-        newline_pos = buf.rfind("\n")
-        pos = file.tell()
-        if newline_pos != -1:
-            line = buf[newline_pos + 1:]
-            buf = buf[:newline_pos]
-            if pos or newline_pos or trailing_newline:
-                line += "\n"
-            yield line
-        elif pos:
-            toread = min(bufsize, pos)
-            file.seek(-toread, 1)
-            buf = file.read(toread) + buf
-            file.seek(-toread, 1)
-            if pos == toread:
-                buf = "\n" + buf
-        else:
+    """Yields lines of file from current position to the beginning
+    in reverse order. File is read backwards by chunks and lines
+    are found by scanning chunks for newlines, parts of long lines
+    are joined once. Only part of file before current position is
+    read, so data appended to file meanwhile doesn't matter, reading
+    stops if file is truncated. File is left positioned at its
+    beginning when all lines are read.
+
+    :param file: file object
+    :param bufsize: number of bytes read at once
+    """
+    pos = file.tell()
+    # parts of line which continues in chunks read before,
+    # the last part first
+    tail = []
+    while pos:
+        size = min(bufsize, pos)
+        pos -= size
+        file.seek(pos)
+        chunk = file.read(size)
+        if len(chunk) < size:
+            # file was truncated meanwhile
             return
+        end = size
+        while end:
+            # newline at the end of line itself isn't searched
+            newline = chunk.rfind("\n", 0, end if tail else end - 1)
+            if newline == -1:
+                tail.append(chunk[:end])
+                break
+            line = chunk[newline + 1:end]
+            if tail:
+                tail.append(line)
+                line = "".join(reversed(tail))
+                tail = []
+            yield line
+            end = newline + 1
+    if tail:
+        yield "".join(reversed(tail))
+    file.seek(0)
+
+
+class LogIndex(object):
+    """Sidecar index of log file: dates of entries sampled
+    every *step* bytes and offsets of lines with them. Index is
+    updated incrementally when file grows, only lines at sample
+    offsets are read. Index is rebuilt when file is truncated
+    or rotated, which is detected by inode, size and head of file.
+    Dates of entries are expected to grow through the file.
+    """
+
+    step = 1024 * 1024
+    # number of bytes at start of file compared to detect rotation
+    head_size = 256
+
+    _indexes = {}
+    _lock = threading.Lock()
+
+    def __init__(self, path, parse_date, step=None):
+        self.path = path
+        self.parse_date = parse_date
+        self.step = step or self.step
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.inode = None
+        self.head = ''
+        self.file_size = 0
+        # offset of the first line which isn't indexed yet
+        self.size = 0
+        self.next_sample = 0
+        # sorted list of (date, offset)
+        self.samples = []
+
+    @classmethod
+    def get(cls, path, parse_date):
+        """Returns updated index of log file
+
+        :param path: path to log file
+        :param parse_date: function which returns date of log line
+            as tuple or None if date can't be parsed
+        """
+        with cls._lock:
+            index = cls._indexes.get(path)
+            if index is None:
+                index = cls._indexes[path] = cls(path, parse_date)
+        index.update()
+        return index
+
+    def update(self):
+        with self.lock:
+            stat = os.stat(self.path)
+            if stat.st_ino != self.inode or stat.st_size < self.file_size:
+                self.reset()
+                self.inode = stat.st_ino
+            if stat.st_size == self.file_size:
+                return
+
+            with open(self.path, 'r') as f:
+                head = f.read(self.head_size)
+                if not head.startswith(self.head):
+                    # file was truncated and has grown past old size
+                    self.reset()
+                    self.inode = stat.st_ino
+                self.head = head
+                self.file_size = stat.st_size
+                self.sample(f)
+
+    def sample(self, f):
+        """Samples lines of file starting from the first line
+        which isn't indexed yet, lines between samples are skipped
+        """
+        offset = self.size
+        f.seek(offset)
+        while True:
+            if offset < self.next_sample:
+                # resynchronise on the first line starting
+                # at sample offset or after it
+                f.seek(self.next_sample - 1)
+                rest = f.readline()
+                if not rest.endswith('\n'):
+                    break
+                offset = self.next_sample - 1 + len(rest)
+            line = f.readline()
+            if not line.endswith('\n'):
+                # line is still being written
+                break
+            date = self.parse_date(line.rstrip('\n'))
+            if date is not None:
+                self.samples.append((date, offset))
+                self.next_sample = offset + self.step
+            offset += len(line)
+        self.size = offset
+
+    def offset_after(self, date):
+        """Returns offset of the first sampled line with
+        date greater than given one or None if there is no such line
+        """
+        with self.lock:
+            for sample_date, offset in self.samples:
+                if sample_date > date:
+                    return offset
+            return None
+
+
+class LogParser(object):
+    """Compiled parser of entries of log source from settings.LOGS.
+    Parsers are cached, so regular expressions are compiled once
+    per source and dates in the common numeric formats are parsed
+    without strptime.
+    """
+
+    # strptime directives parsed by regular expression and
+    # indexes of corresponding fields in date tuple
+    date_directives = {
+        'Y': (r'(\d{4})', 0),
+        'm': (r'(\d{1,2})', 1),
+        'd': (r'(\d{1,2})', 2),
+        'H': (r'(\d{1,2})', 3),
+        'M': (r'(\d{1,2})', 4),
+        'S': (r'(\d{1,2})', 5),
+    }
+    # strftime directives formatted by % operator
+    format_directives = {
+        'Y': '%04d',
+        'm': '%02d',
+        'd': '%02d',
+        'H': '%02d',
+        'M': '%02d',
+        'S': '%02d',
+    }
+
+    _parsers = {}
+    _formatters = {}
+
+    def __init__(self, log_config):
+        self.date_format = log_config['date_format']
+        self.regexp = re.compile(log_config['regexp'])
+        skip_regexp = log_config.get('skip_regexp')
+        self.skip_regexp = re.compile(skip_regexp) if skip_regexp else None
+        self.date_regexp, self.date_fields = \
+            self.compile_date_format(self.date_format)
+
+    @classmethod
+    def get(cls, log_config):
+        """Returns cached parser for log source
+
+        :param log_config: log source from settings.LOGS
+        :raises: re.error if regular expression in config is invalid
+        """
+        key = (
+            log_config['id'],
+            log_config['regexp'],
+            log_config.get('skip_regexp'),
+            log_config['date_format']
+        )
+        parser = cls._parsers.get(key)
+        if parser is None:
+            parser = cls._parsers[key] = cls(log_config)
+        return parser
+
+    @classmethod
+    def compile_date_format(cls, date_format):
+        """Returns regular expression matching dates in given format
+        and list of date tuple indexes of its groups or (None, None)
+        if format has directives which can't be parsed this way
+        """
+        pattern = []
+        fields = []
+        for i, part in enumerate(re.split(r'(%.)', date_format)):
+            if i % 2 == 0:
+                pattern.append(re.escape(part))
+            elif part[1] in cls.date_directives:
+                group, field = cls.date_directives[part[1]]
+                pattern.append(group)
+                fields.append(field)
+            elif part == '%%':
+                pattern.append('%')
+            else:
+                return None, None
+        return re.compile(''.join(pattern) + '$'), fields
+
+    def parse_date(self, date):
+        """Returns date as tuple of year, month, day, hour,
+        minute and second
+
+        :raises: ValueError if date doesn't match format
+        """
+        if self.date_regexp is None:
+            return time.strptime(date, self.date_format)[:6]
+        m = self.date_regexp.match(date)
+        if m is None:
+            raise ValueError("time data %r does not match format %r" %
+                             (date, self.date_format))
+        parsed = [1900, 1, 1, 0, 0, 0]
+        for field, value in zip(self.date_fields, m.groups()):
+            parsed[field] = int(value)
+        # validates ranges of fields
+        datetime.datetime(*parsed)
+        return tuple(parsed)
+
+    def parse_line_date(self, line):
+        """Returns date of log line or None if it can't be parsed
+        """
+        m = self.regexp.match(line)
+        if m is None:
+            return None
+        try:
+            return self.parse_date(m.group('date'))
+        except ValueError:
+            return None
+
+    @classmethod
+    def format_date(cls, date, date_format):
+        """Formats date tuple returned by parse_date
+
+        :param date: date tuple
+        :param date_format: strftime format
+        """
+        if date_format not in cls._formatters:
+            cls._formatters[date_format] = cls.compile_format(date_format)
+        formatter = cls._formatters[date_format]
+        if formatter is not None:
+            template, fields = formatter
+            return template % tuple(date[f] for f in fields)
+        return time.strftime(
+            date_format,
+            datetime.datetime(*date).timetuple()
+        )
+
+    @classmethod
+    def compile_format(cls, date_format):
+        """Returns template for % operator and list of date
+        tuple indexes of its values or None if format has
+        directives which can't be formatted this way
+        """
+        template = []
+        fields = []
+        for i, part in enumerate(re.split(r'(%.)', date_format)):
+            if i % 2 == 0:
+                template.append(part)
+            elif part[1] in cls.format_directives:
+                template.append(cls.format_directives[part[1]])
+                fields.append(cls.date_directives[part[1]][1])
+            elif part == '%%':
+                template.append('%%')
+            else:
+                return None
+        return ''.join(template), fields
+
+    @classmethod
+    def get_masking(cls, accounts):
+        """Returns function which replaces usernames and passwords
+        of accounts in text or None if there are no accounts
+        """
+        groups = []
+        for group in ('username', 'password'):
+            values = filter(None, (getattr(a, group) for a in accounts))
+            if values:
+                groups.append('(?P<{0}>{1})'.format(
+                    group, '|'.join(map(re.escape, values))))
+        if not groups:
+            return None
+        masking = re.compile('|'.join(groups))
+        return lambda text: masking.sub(lambda m: m.lastgroup, text)
 
 
 class LogEntryCollectionHandler(JSONHandler):
@@ -107,7 +387,7 @@ class LogEntryCollectionHandler(JSONHandler):
         if date_before:
             try:
                 date_before = time.strptime(date_before,
-                                            settings.UI_LOG_DATE_FORMAT)
+                                            settings.UI_LOG_DATE_FORMAT)[:6]
             except ValueError:
                 logger.debug("Invalid 'date_before' value: %s", date_before)
                 raise web.badrequest("Invalid 'date_before' value")
@@ -115,7 +395,7 @@ class LogEntryCollectionHandler(JSONHandler):
         if date_after:
             try:
                 date_after = time.strptime(date_after,
-                                           settings.UI_LOG_DATE_FORMAT)
+                                           settings.UI_LOG_DATE_FORMAT)[:6]
             except ValueError:
                 logger.debug("Invalid 'date_after' value: %s", date_after)
                 raise web.badrequest("Invalid 'date_after' value")
@@ -180,7 +460,7 @@ class LogEntryCollectionHandler(JSONHandler):
             allowed_levels = [l for l in dropwhile(lambda l: l != level,
                                                    log_config['levels'])]
         try:
-            regexp = re.compile(log_config['regexp'])
+            parser = LogParser.get(log_config)
         except re.error as e:
             logger.error('Invalid regular expression for file %r: %s',
                          log_config['id'], e)
@@ -209,25 +489,22 @@ class LogEntryCollectionHandler(JSONHandler):
             logger.debug("Invalid 'max_entries' value: %d", max_entries)
             raise web.badrequest("Invalid 'max_entries' value")
 
-        accs = db().query(RedHatAccount).all()
-        regs = []
-        if len(accs) > 0:
-            regs = [
-                (
-                    re.compile(r"|".join([a.username for a in accs])),
-                    "username"
-                ),
-                (
-                    re.compile(r"|".join([a.password for a in accs])),
-                    "password"
-                )
-            ]
+        mask = LogParser.get_masking(db().query(RedHatAccount).all())
+
+        end_byte = log_file_size
+        if date_before:
+            # entries after sampled line with later date are skipped
+            offset = LogIndex.get(
+                log_file, parser.parse_line_date
+            ).offset_after(date_before)
+            if offset is not None:
+                end_byte = offset
 
         has_more = False
         with open(log_file, 'r') as f:
-            f.seek(0, 2)
+            f.seek(end_byte)
             # we need to calculate current position manually instead of using
-            # tell() because read_backwards uses buffering
+            # tell() because read_backwards reads file by chunks
             pos = f.tell()
             multilinebuf = []
             for line in read_backwards(f):
@@ -238,10 +515,9 @@ class LogEntryCollectionHandler(JSONHandler):
                 entry = line.rstrip('\n')
                 if not len(entry):
                     continue
-                if 'skip_regexp' in log_config and \
-                        re.match(log_config['skip_regexp'], entry):
+                if parser.skip_regexp and parser.skip_regexp.match(entry):
                     continue
-                m = regexp.match(entry)
+                m = parser.regexp.match(entry)
                 if m is None:
                     if log_config.get('multiline'):
                         #  Add next multiline part to last entry if it exist.
@@ -259,8 +535,7 @@ class LogEntryCollectionHandler(JSONHandler):
                 if level and not (entry_level in allowed_levels):
                     continue
                 try:
-                    entry_date = time.strptime(m.group('date'),
-                                               log_config['date_format'])
+                    entry_date = parser.parse_date(m.group('date'))
                 except ValueError:
                     logger.debug("Unable to parse date from log entry."
                                  " Date format: %r, date part of entry: %r",
@@ -268,11 +543,16 @@ class LogEntryCollectionHandler(JSONHandler):
                                  m.group('date'))
                     continue
 
-                for regex, replace in regs:
-                    entry_text = regex.sub(replace, entry_text)
+                if date_before and entry_date > date_before:
+                    continue
+                if date_after and entry_date < date_after:
+                    # entries are sorted by date
+                    has_more = False
+                    break
 
                 entries.append([
-                    time.strftime(settings.UI_LOG_DATE_FORMAT, entry_date),
+                    LogParser.format_date(entry_date,
+                                          settings.UI_LOG_DATE_FORMAT),
                     entry_level,
                     entry_text
                 ])
@@ -280,6 +560,15 @@ class LogEntryCollectionHandler(JSONHandler):
                     has_more = True
                     break
 
+        if mask and entries:
+            # texts of the page are masked at once
+            texts = mask('\0'.join(item[2] for item in entries)).split('\0')
+            if len(texts) != len(entries):
+                # some text contains NUL itself
+                texts = [mask(item[2]) for item in entries]
+            for entry, text in zip(entries, texts):
+                entry[2] = text
+
         return {
             'entries': entries,
             'to': log_file_size,
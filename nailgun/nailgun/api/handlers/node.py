@@ -49,17 +49,36 @@ class NodeHandler(JSONHandler):
     validator = NodeValidator
 
     @classmethod
-    def render(cls, instance, fields=None):
+    def render(cls, instance, fields=None, network_data=None):
         json_data = None
         try:
             json_data = JSONHandler.render(instance, fields=cls.fields)
-            network_manager = NetworkManager()
-            json_data['network_data'] = network_manager.get_node_networks(
-                instance.id)
+            if network_data is None:
+                network_manager = NetworkManager()
+                network_data = network_manager.get_node_networks(
+                    instance.id)
+            json_data['network_data'] = network_data
         except Exception:
             logger.error(traceback.format_exc())
         return json_data
 
+    @classmethod
+    def render_collection(cls, nodes):
+        """Renders list of nodes. Network data for all nodes
+        is received at once, falls back to rendering nodes
+        one by one if it can't be received for some node.
+        """
+        try:
+            nodes_networks = NetworkManager().get_nodes_networks(
+                [n.id for n in nodes])
+        except Exception:
+            logger.error(traceback.format_exc())
+            return map(cls.render, nodes)
+        return [
+            cls.render(n, network_data=nodes_networks[n.id])
+            for n in nodes
+        ]
+
     @content_json
     def GET(self, node_id):
         """:returns: JSONized Node object.
@@ -108,6 +127,11 @@ class NodeHandler(JSONHandler):
             if key in ("id", "cluster_id"):
                 continue
             setattr(node, key, value)
+        if "meta" in data:
+            # meta isn't accepted from agent, digest and checksum
+            # are outdated, so agent sends full update next time
+            node.meta_digest = None
+            node.agent_checksum = None
         if not node.status in ('provisioning', 'deploying') \
                 and "roles" in data or "cluster_id" in data:
             try:
@@ -163,7 +187,7 @@ class NodeCollectionHandler(JSONHandler):
                 cluster_id=user_data.cluster_id).all()
         else:
             nodes = db().query(Node).all()
-        return map(NodeHandler.render, nodes)
+        return NodeHandler.render_collection(nodes)
 
     @content_json
     def POST(self):
@@ -304,6 +328,10 @@ class NodeCollectionHandler(JSONHandler):
                     notifier.notify("discover", msg, node_id=node.id)
                 db().commit()
             old_cluster_id = node.cluster_id
+            # interfaces and volumes are not checked
+            # if hardware isn't changed
+            meta_unchanged = "meta" in nd and \
+                not node.is_meta_changed(nd["meta"])
 
             if nd.get("pending_roles") == [] and node.cluster:
                 node.cluster.clear_pending_changes(node_id=node.id)
@@ -323,9 +351,13 @@ class NodeCollectionHandler(JSONHandler):
                     )
                     continue
                 if key == "meta":
-                    node.update_meta(value)
+                    if not meta_unchanged:
+                        node.update_meta(value)
                 else:
                     setattr(node, key, value)
+            if "meta" in nd and not is_agent:
+                # agent has to send full update next time
+                node.agent_checksum = None
             db().commit()
             if not node.attributes:
                 node.attributes = NodeAttributes()
@@ -336,6 +368,7 @@ class NodeCollectionHandler(JSONHandler):
                 db().commit()
             if not node.status in ('provisioning', 'deploying'):
                 variants = (
+                    not meta_unchanged and
                     "disks" in node.meta and
                     len(node.meta["disks"]) != len(
                         filter(
@@ -367,7 +400,7 @@ class NodeCollectionHandler(JSONHandler):
                         notifier.notify("error", msg, node_id=node.id)
 
                 db().commit()
-            if is_agent:
+            if is_agent and not meta_unchanged:
                 # Update node's NICs.
                 if node.meta and 'interfaces' in node.meta:
                     # we won't update interfaces if data is invalid
@@ -384,7 +417,40 @@ class NodeCollectionHandler(JSONHandler):
                         node.id
                     )
                     network_manager.assign_networks_to_main_interface(node.id)
-        return map(NodeHandler.render, nodes_updated)
+        return NodeHandler.render_collection(nodes_updated)
+
+
+class NodeAgentHandler(JSONHandler):
+    """Node check-ins of nailgun-agent
+    """
+
+    validator = NodeValidator
+
+    @content_json
+    def PUT(self):
+        """Marks node as alive if data reported by agent
+        is not changed since last full update
+
+        :returns: JSONized node id.
+        :http: * 200 (node timestamp is updated)
+               * 400 (invalid data specified)
+               * 404 (node is not found, is offline or its data is
+                 changed - full update with PUT /nodes/ is required)
+        """
+        data = self.checked_data(self.validator.validate_heartbeat)
+        nodes = Node.__table__
+        node_id = db().execute(
+            nodes.update().where(
+                (nodes.c.mac == data["mac"]) &
+                (nodes.c.agent_checksum == data["agent_checksum"]) &
+                nodes.c.online
+            ).values(
+                timestamp=datetime.now()
+            ).returning(nodes.c.id)
+        ).scalar()
+        if not node_id:
+            raise web.notfound()
+        return {"id": node_id}
 
 
 class NodeNICsHandler(JSONHandler):
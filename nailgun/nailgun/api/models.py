@@ -15,10 +15,14 @@
 #    under the License.
 
 from copy import deepcopy
+import hashlib
+import json
 from random import choice
 import string
 import uuid
 
+from netaddr import IPAddress
+from sqlalchemy import BigInteger
 from sqlalchemy import Boolean
 from sqlalchemy import Column
 from sqlalchemy import Float
@@ -29,6 +33,7 @@ from sqlalchemy import Unicode
 from sqlalchemy import UniqueConstraint
 from sqlalchemy import ForeignKey, Enum, DateTime
 from sqlalchemy.orm import relationship, backref
+from sqlalchemy.orm import validates
 from sqlalchemy.ext.declarative import declarative_base
 import web
 
@@ -115,7 +120,7 @@ class ClusterChanges(Base):
         'disks'
     )
     id = Column(Integer, primary_key=True)
-    cluster_id = Column(Integer, ForeignKey('clusters.id'))
+    cluster_id = Column(Integer, ForeignKey('clusters.id'), index=True)
     node_id = Column(Integer, ForeignKey('nodes.id', ondelete='CASCADE'))
     name = Column(
         Enum(*POSSIBLE_CHANGES, name='possible_changes'),
@@ -236,9 +241,8 @@ class Cluster(Base):
         nodes_ids = sorted([n.id for n in nodes])
         netmanager = NetworkManager()
         if nodes_ids:
-            netmanager.assign_ips(nodes_ids, 'management')
-            netmanager.assign_ips(nodes_ids, 'public')
-            netmanager.assign_ips(nodes_ids, 'storage')
+            netmanager.bulk_assign_ips(
+                nodes_ids, ['management', 'public', 'storage'])
 
     def prepare_for_provisioning(self):
         from nailgun.network.manager import NetworkManager
@@ -247,9 +251,10 @@ class Cluster(Base):
         netmanager = NetworkManager()
         nodes = TaskHelper.nodes_to_provision(self)
         TaskHelper.update_slave_nodes_fqdn(nodes)
-        for node in nodes:
-            netmanager.assign_admin_ips(
-                node.id, len(node.meta.get('interfaces', [])))
+        netmanager.bulk_assign_admin_ips(dict(
+            (node.id, len(node.meta.get('interfaces', [])))
+            for node in nodes
+        ))
 
 
 class Node(Base):
@@ -268,7 +273,7 @@ class Node(Base):
         'deletion'
     )
     id = Column(Integer, primary_key=True)
-    cluster_id = Column(Integer, ForeignKey('clusters.id'))
+    cluster_id = Column(Integer, ForeignKey('clusters.id'), index=True)
     name = Column(Unicode(100))
     status = Column(
         Enum(*NODE_STATUSES, name='node_status'),
@@ -288,8 +293,13 @@ class Node(Base):
     changes = relationship("ClusterChanges", backref="node")
     error_type = Column(Enum(*NODE_ERRORS, name='node_error_type'))
     error_msg = Column(String(255))
-    timestamp = Column(DateTime, nullable=False)
+    # last check-in of nailgun-agent, used by keepalive
+    timestamp = Column(DateTime, nullable=False, index=True)
     online = Column(Boolean, default=True)
+    # checksum of data last reported by nailgun-agent
+    agent_checksum = Column(String(40))
+    # digest of last accepted meta, see get_meta_digest
+    meta_digest = Column(String(40))
     role_list = relationship("Role", secondary=NodeRoles.__table__)
     pending_role_list = relationship("Role",
                                      secondary=PendingNodeRoles.__table__)
@@ -369,8 +379,20 @@ class Node(Base):
             iface[param] = val
         return iface
 
+    @classmethod
+    def get_meta_digest(cls, meta):
+        """Returns digest of canonical JSON representation of meta
+        """
+        return hashlib.sha1(
+            json.dumps(meta, sort_keys=True, separators=(',', ':'))
+        ).hexdigest()
+
+    def is_meta_changed(self, data):
+        return self.meta_digest != self.get_meta_digest(data)
+
     def update_meta(self, data):
         # helper for basic checking meta before updation
+        self.meta_digest = self.get_meta_digest(data)
         result = []
         for iface in data["interfaces"]:
             if not self._check_interface_has_required_params(iface):
@@ -388,6 +410,7 @@ class Node(Base):
 
     def create_meta(self, data):
         # helper for basic checking meta before creation
+        self.meta_digest = self.get_meta_digest(data)
         result = []
         for iface in data["interfaces"]:
             if not self._check_interface_has_required_params(iface):
@@ -413,9 +436,18 @@ class NodeAttributes(Base):
 class IPAddr(Base):
     __tablename__ = 'ip_addrs'
     id = Column(Integer, primary_key=True)
-    network = Column(Integer, ForeignKey('networks.id', ondelete="CASCADE"))
-    node = Column(Integer, ForeignKey('nodes.id', ondelete="CASCADE"))
-    ip_addr = Column(String(25), nullable=False)
+    network = Column(Integer, ForeignKey('networks.id', ondelete="CASCADE"),
+                     index=True)
+    node = Column(Integer, ForeignKey('nodes.id', ondelete="CASCADE"),
+                  index=True)
+    ip_addr = Column(String(25), nullable=False, index=True)
+    # ip_addr as integer for range queries, set by validator
+    ip_addr_int = Column(BigInteger, nullable=False, index=True)
+
+    @validates('ip_addr')
+    def validate_ip_addr(self, key, ip_addr):
+        self.ip_addr_int = int(IPAddress(ip_addr))
+        return ip_addr
 
 
 class IPAddrRange(Base):
@@ -424,6 +456,14 @@ class IPAddrRange(Base):
     network_group_id = Column(Integer, ForeignKey('network_groups.id'))
     first = Column(String(25), nullable=False)
     last = Column(String(25), nullable=False)
+    # first and last as integers for range queries, set by validator
+    first_int = Column(BigInteger, nullable=False)
+    last_int = Column(BigInteger, nullable=False)
+
+    @validates('first', 'last')
+    def validate_bound(self, key, ip_addr):
+        setattr(self, key + '_int', int(IPAddress(ip_addr)))
+        return ip_addr
 
 
 class Vlan(Base):
@@ -497,6 +537,32 @@ class NetworkGroup(Base):
         ]
         return vlans
 
+    @classmethod
+    def compress_vlan_ids(cls, vlans):
+        """Converts VLAN ids to sorted list of inclusive ranges,
+        e.g. [100, 101, 102, 200] to [[100, 102], [200, 200]]
+        """
+        ranges = []
+        for vlan in sorted(set(vlans)):
+            if ranges and ranges[-1][1] == vlan - 1:
+                ranges[-1][1] = vlan
+            else:
+                ranges.append([vlan, vlan])
+        return ranges
+
+    @classmethod
+    def expand_vlan_ids(cls, vlans):
+        """Returns set of VLAN ids from list which can
+        contain both VLAN ids and ranges of them
+        """
+        result = set()
+        for vlan in vlans:
+            if isinstance(vlan, (list, tuple)):
+                result.update(xrange(vlan[0], vlan[1] + 1))
+            else:
+                result.add(vlan)
+        return result
+
 
 class NetworkConfiguration(object):
     @classmethod
@@ -672,8 +738,8 @@ class Task(Base):
         'dump',
     )
     id = Column(Integer, primary_key=True)
-    cluster_id = Column(Integer, ForeignKey('clusters.id'))
-    uuid = Column(String(36), nullable=False,
+    cluster_id = Column(Integer, ForeignKey('clusters.id'), index=True)
+    uuid = Column(String(36), nullable=False, index=True,
                   default=lambda: str(uuid.uuid4()))
     name = Column(
         Enum(*TASK_NAMES, name='task_name'),
@@ -752,9 +818,17 @@ class Notification(Base):
     status = Column(
         Enum(*NOTIFICATION_STATUSES, name='notif_status'),
         nullable=False,
-        default='unread'
+        default='unread',
+        index=True
     )
-    datetime = Column(DateTime, nullable=False)
+    datetime = Column(DateTime, nullable=False, index=True)
+
+
+class RPCOutboxMessage(Base):
+    __tablename__ = 'rpc_outbox'
+    id = Column(Integer, primary_key=True)
+    routing_key = Column(String(100), nullable=False)
+    message = Column(JSON, nullable=False)
 
 
 class L2Topology(Base):
@@ -36,6 +36,7 @@ from nailgun.api.handlers.network_configuration \
 from nailgun.api.handlers.network_configuration \
     import NetworkConfigurationVerifyHandler
 
+from nailgun.api.handlers.node import NodeAgentHandler
 from nailgun.api.handlers.node import NodeCollectionHandler
 from nailgun.api.handlers.node import NodeHandler
 from nailgun.api.handlers.node import NodesAllocationStatsHandler
@@ -103,6 +104,8 @@ urls = (
 
     r'/nodes/?$',
     NodeCollectionHandler,
+    r'/nodes/agent/?$',
+    NodeAgentHandler,
     r'/nodes/(?P<node_id>\d+)/?$',
     NodeHandler,
     r'/nodes/(?P<node_id>\d+)/disks/?$',
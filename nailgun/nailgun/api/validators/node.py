@@ -170,6 +170,22 @@ class NodeValidator(BasicValidator):
             d['meta'] = MetaValidator.validate_update(d['meta'])
         return d
 
+    @classmethod
+    def validate_heartbeat(cls, data):
+        d = cls.validate_json(data)
+        if not isinstance(d, dict):
+            raise errors.InvalidData(
+                "Node data must be dict",
+                log_message=True
+            )
+        for key in ("mac", "agent_checksum"):
+            if not d.get(key):
+                raise errors.InvalidData(
+                    "No {0} specified".format(key),
+                    log_message=True
+                )
+        return d
+
     @classmethod
     def validate_collection_update(cls, data):
         d = cls.validate_json(data)
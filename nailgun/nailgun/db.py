@@ -15,12 +15,15 @@
 #    under the License.
 
 import contextlib
+import os
+
 import web
 from sqlalchemy.orm import scoped_session, sessionmaker
 from sqlalchemy import create_engine
 from sqlalchemy.orm.query import Query
 
 from nailgun.settings import settings
+from nailgun import sqlstats
 
 
 db_str = "{engine}://{user}:{passwd}@{host}:{port}/{name}".format(
@@ -28,16 +31,21 @@ db_str = "{engine}://{user}:{passwd}@{host}:{port}/{name}".format(
 
 
 engine = create_engine(db_str, client_encoding='utf8')
+sqlstats.instrument(engine)
 
 
 class NoCacheQuery(Query):
     """Override for common Query class.
     Needed for automatic refreshing objects
     from database during every query for evading
-    problems with multiple sessions
+    problems with multiple sessions.
+
+    If DB_IDENTITY_MAP is set objects already loaded within
+    unit of work are taken from identity map and :func:`refresh`
+    should be called to see changes made by other sessions.
     """
     def __init__(self, *args, **kwargs):
-        self._populate_existing = True
+        self._populate_existing = not settings.DB_IDENTITY_MAP
         super(NoCacheQuery, self).__init__(*args, **kwargs)
 
 
@@ -65,9 +73,74 @@ def load_db_driver(handler):
         db().expire_all()
 
 
+def refresh(*objects):
+    """Reloads objects from database to see changes made
+    by other sessions, e.g. by RPC receiver thread.
+    All objects of session are expired if no objects are given.
+    Does nothing unless DB_IDENTITY_MAP is set, as objects are
+    reloaded by every query then.
+    """
+    if not settings.DB_IDENTITY_MAP:
+        return
+    if not objects:
+        db().expire_all()
+    for obj in objects:
+        db().refresh(obj)
+
+
+def migration_config(url=None):
+    """:param url: database url, nailgun database is used by default
+    :returns: alembic config of nailgun migrations
+    """
+    from alembic.config import Config
+    config = Config()
+    config.set_main_option(
+        'script_location',
+        os.path.join(os.path.dirname(__file__), 'migrations')
+    )
+    if url:
+        # value is interpolated by ConfigParser
+        config.set_main_option('sqlalchemy.url', url.replace('%', '%%'))
+    return config
+
+
+def current_revision():
+    """:returns: revision of database schema or None
+    if database isn't under migrations control
+    """
+    from alembic.migration import MigrationContext
+    with contextlib.closing(engine.connect()) as con:
+        return MigrationContext.configure(con).get_current_revision()
+
+
+def migrate(revision='head'):
+    """Upgrades database schema to given revision
+    """
+    from alembic import command
+    command.upgrade(migration_config(), revision)
+
+
+def downgrade(revision):
+    """Downgrades database schema to given revision,
+    relative revisions like -1 are supported
+    """
+    from alembic import command
+    command.downgrade(migration_config(), revision)
+
+
 def syncdb():
+    """Creates database schema if database is empty,
+    otherwise upgrades it to the latest revision
+    """
+    from alembic import command
     from nailgun.api.models import Base
-    Base.metadata.create_all(engine)
+    with contextlib.closing(engine.connect()) as con:
+        empty = not engine.dialect.has_table(con, 'nodes')
+    if empty and current_revision() is None:
+        Base.metadata.create_all(engine)
+        command.stamp(migration_config(), 'head')
+    else:
+        migrate()
 
 
 def dropdb():
@@ -36,10 +36,7 @@ class KeepAliveThread(threading.Thread):
         self.stop_status_checking = threading.Event()
         self.interval = interval or settings.KEEPALIVE['interval']
         self.timeout = timeout or settings.KEEPALIVE['timeout']
-
-    def reset_nodes_timestamp(self):
-        db().query(Node).update({'timestamp': datetime.now()})
-        db().commit()
+        self.started_at = None
 
     def join(self, timeout=None):
         self.stop_status_checking.set()
@@ -54,7 +51,9 @@ class KeepAliveThread(threading.Thread):
     def run(self):
         while True:
             try:
-                self.reset_nodes_timestamp()
+                # nodes get the whole timeout to check in after
+                # start, so their timestamps are not reset
+                self.started_at = datetime.now()
                 while not self.stop_status_checking.isSet():
                     self.update_status_nodes()
                     self.sleep()
@@ -66,19 +65,25 @@ class KeepAliveThread(threading.Thread):
                 break
 
     def update_status_nodes(self):
+        deadline = datetime.now() - timedelta(seconds=self.timeout)
+        if self.started_at and self.started_at > deadline:
+            return
+        # indexed timestamp is compared with constant,
+        # so only expired nodes are read
         to_update = db().query(Node).filter(
-            not_(Node.status == 'provisioning')
+            Node.timestamp < deadline
         ).filter(
-            datetime.now() > (Node.timestamp + timedelta(seconds=self.timeout))
+            not_(Node.status == 'provisioning')
         ).filter_by(
             online=True
         )
-        for node_db in to_update:
-            notifier.notify(
-                "error",
-                u"Node '{0}' has gone away".format(
-                    node_db.human_readable_name),
-                node_id=node_db.id
-            )
-        to_update.update({"online": False})
+        with notifier.buffered():
+            for node_db in to_update:
+                notifier.notify(
+                    "error",
+                    u"Node '{0}' has gone away".format(
+                        node_db.human_readable_name),
+                    node_id=node_db.id
+                )
+            to_update.update({"online": False})
         db().commit()
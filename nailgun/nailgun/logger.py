@@ -19,6 +19,7 @@ from logging.handlers import WatchedFileHandler
 from StringIO import StringIO
 
 from nailgun.settings import settings
+from nailgun import sqlstats
 
 logger = logging.getLogger("nailgun")
 api_logger = logging.getLogger("nailgun-api")
@@ -52,13 +53,16 @@ class HTTPLoggerMiddleware(object):
         env['wsgi.errors'] = WriteLogger(api_logger.error)
         self.__logging_request(env)
 
-        def start_response_with_logging(status, headers, *args):
-            self.__logging_response(env, status)
-            return start_response(status, headers, *args)
+        with sqlstats.collect() as sql_stats:
+            def start_response_with_logging(status, headers, *args):
+                self.__logging_response(env, status, sql_stats)
+                if sql_stats and settings.SQL_STATS_HEADERS:
+                    headers = headers + sql_stats.headers()
+                return start_response(status, headers, *args)
 
-        return self.application(env, start_response_with_logging)
+            return self.application(env, start_response_with_logging)
 
-    def __logging_response(self, env, response_code):
+    def __logging_response(self, env, response_code, sql_stats=None):
         response_info = "Response code '%s' for %s %s from %s:%s" % (
             response_code,
             env['REQUEST_METHOD'],
@@ -66,6 +70,12 @@ class HTTPLoggerMiddleware(object):
             self.__get_remote_ip(env),
             env['REMOTE_PORT'],
         )
+        if sql_stats:
+            response_info += " (%s)" % sql_stats
+            sql_stats.warn_repeated(
+                api_logger,
+                "%s %s" % (env['REQUEST_METHOD'], env['REQUEST_URI'])
+            )
 
         if response_code == SERVER_ERROR_MSG:
             api_logger.error(response_info)
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+
+#    Copyright 2013 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Alembic environment of nailgun database migrations,
+see nailgun.db.migrate
+"""
+
+import contextlib
+
+from alembic import context
+from sqlalchemy import create_engine
+from sqlalchemy.pool import NullPool
+
+from nailgun.api.models import Base
+from nailgun import db
+
+
+url = context.config.get_main_option('sqlalchemy.url')
+engine = create_engine(url, poolclass=NullPool) if url else db.engine
+
+with contextlib.closing(engine.connect()) as connection:
+    context.configure(
+        connection=connection,
+        target_metadata=Base.metadata
+    )
+    with context.begin_transaction():
+        context.run_migrations()
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+
+#    Copyright 2013 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Indexes on columns used for lookups
+
+Revision ID: 1085ed5291d7
+Revises: b96341587bc8
+Create Date: 2026-10-18 20:20:00
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '1085ed5291d7'
+down_revision = 'b96341587bc8'
+
+
+indexes = (
+    ('ip_addrs', 'ip_addr'),
+    ('ip_addrs', 'node'),
+    ('ip_addrs', 'network'),
+    ('nodes', 'cluster_id'),
+    ('tasks', 'uuid'),
+    ('tasks', 'cluster_id'),
+    ('notifications', 'datetime'),
+    ('notifications', 'status'),
+    ('cluster_changes', 'cluster_id'),
+)
+
+
+def upgrade():
+    for table, column in indexes:
+        op.create_index('ix_{0}_{1}'.format(table, column), table, [column])
+
+
+def downgrade():
+    for table, column in reversed(indexes):
+        op.drop_index('ix_{0}_{1}'.format(table, column), table)
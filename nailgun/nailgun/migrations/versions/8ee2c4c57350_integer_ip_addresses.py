@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+
+#    Copyright 2013 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""IP addresses as integers for range queries
+
+Revision ID: 8ee2c4c57350
+Revises: 1085ed5291d7
+Create Date: 2026-10-18 21:00:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '8ee2c4c57350'
+down_revision = '1085ed5291d7'
+
+
+columns = (
+    ('ip_addrs', 'ip_addr'),
+    ('ip_addr_ranges', 'first'),
+    ('ip_addr_ranges', 'last'),
+)
+
+
+def upgrade():
+    for table, column in columns:
+        op.add_column(
+            table,
+            sa.Column('{0}_int'.format(column), sa.BigInteger())
+        )
+        # difference of inet values is bigint
+        op.execute(
+            "UPDATE {0} SET {1}_int = "
+            "{1}::inet - '0.0.0.0'::inet".format(table, column)
+        )
+        op.alter_column(table, '{0}_int'.format(column), nullable=False)
+    op.create_index('ix_ip_addrs_ip_addr_int', 'ip_addrs', ['ip_addr_int'])
+
+
+def downgrade():
+    op.drop_index('ix_ip_addrs_ip_addr_int', 'ip_addrs')
+    for table, column in reversed(columns):
+        op.drop_column(table, '{0}_int'.format(column))
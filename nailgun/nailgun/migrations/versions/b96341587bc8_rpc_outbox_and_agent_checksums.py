@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+
+#    Copyright 2013 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""RPC outbox and checksums of nailgun-agent data
+
+Revision ID: b96341587bc8
+Revises: e4dc3ef15292
+Create Date: 2026-10-18 20:15:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'b96341587bc8'
+down_revision = 'e4dc3ef15292'
+
+
+def upgrade():
+    op.create_table(
+        'rpc_outbox',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('routing_key', sa.String(length=100), nullable=False),
+        sa.Column('message', sa.Text(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.add_column('nodes', sa.Column('agent_checksum', sa.String(length=40)))
+    op.add_column('nodes', sa.Column('meta_digest', sa.String(length=40)))
+    op.create_index('ix_nodes_timestamp', 'nodes', ['timestamp'])
+
+
+def downgrade():
+    op.drop_index('ix_nodes_timestamp', 'nodes')
+    op.drop_column('nodes', 'meta_digest')
+    op.drop_column('nodes', 'agent_checksum')
+    op.drop_table('rpc_outbox')
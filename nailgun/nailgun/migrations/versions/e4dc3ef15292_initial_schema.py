@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+
+#    Copyright 2013 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Initial schema
+
+Schema created by syncdb before migrations were introduced,
+databases without revision are upgraded from here.
+
+Revision ID: e4dc3ef15292
+Revises: None
+Create Date: 2026-10-18 20:10:00
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'e4dc3ef15292'
+down_revision = None
+
+
+def upgrade():
+    pass
+
+
+def downgrade():
+    pass
@@ -15,8 +15,6 @@
 #    under the License.
 
 from itertools import chain
-from itertools import ifilter
-from itertools import imap
 from itertools import islice
 import math
 
@@ -24,6 +22,8 @@ from netaddr import IPAddress
 from netaddr import IPNetwork
 from netaddr import IPRange
 from netaddr import IPSet
+from sqlalchemy import and_
+from sqlalchemy import func
 from sqlalchemy.sql import not_
 
 from nailgun.api.models import Cluster
@@ -282,32 +282,57 @@ class NetworkManager(object):
         :type  num: int
         :returns: None
         '''
-        admin_net_id = self.get_admin_network_id()
-        node_admin_ips = db().query(IPAddr).filter_by(
-            node=node_id,
-            network=admin_net_id
-        ).all()
+        self.bulk_assign_admin_ips({node_id: num})
 
-        if not node_admin_ips or len(node_admin_ips) < num:
-            admin_net = db().query(Network).get(admin_net_id)
-            logger.debug(
-                u"Trying to assign admin ips: node=%s count=%s",
-                node_id,
-                num - len(node_admin_ips)
-            )
-            free_ips = self.get_free_ips(
-                admin_net.network_group.id,
-                num=num - len(node_admin_ips)
-            )
-            logger.info(len(free_ips))
-            for ip in free_ips:
-                ip_db = IPAddr(
-                    node=node_id,
-                    ip_addr=ip,
-                    network=admin_net_id
+    def bulk_assign_admin_ips(self, nodes_ips_count):
+        '''Method for assigning admin IP addresses to many nodes
+        at once. Existing addresses are counted with one query,
+        all missing addresses are allocated in one pass and
+        inserted in a single transaction.
+
+        :param nodes_ips_count: Number of IP addresses for every node.
+        :type  nodes_ips_count: dict {node_id: num}
+        :returns: None
+        '''
+        if not nodes_ips_count:
+            return
+
+        admin_net = self.get_admin_network()
+        assigned_count = dict(
+            db().query(IPAddr.node, func.count(IPAddr.id)).filter(
+                IPAddr.network == admin_net.id
+            ).filter(
+                IPAddr.node.in_(nodes_ips_count.keys())
+            ).group_by(IPAddr.node).all()
+        )
+
+        required = []
+        for node_id in sorted(nodes_ips_count):
+            count = nodes_ips_count[node_id] - assigned_count.get(node_id, 0)
+            if count > 0:
+                logger.debug(
+                    u"Trying to assign admin ips: node=%s count=%s",
+                    node_id,
+                    count
                 )
-                db().add(ip_db)
-            db().commit()
+                required.extend([node_id] * count)
+
+        if not required:
+            return
+
+        free_ips = self.get_free_ips(
+            admin_net.network_group_id,
+            num=len(required)
+        )
+        logger.info(len(free_ips))
+        for node_id, ip in zip(required, free_ips):
+            ip_db = IPAddr(
+                node=node_id,
+                ip_addr=ip,
+                network=admin_net.id
+            )
+            db().add(ip_db)
+        db().commit()
 
     def assign_ips(self, nodes_ids, network_name):
         """Idempotent assignment IP addresses to nodes.
@@ -325,11 +350,32 @@ class NetworkManager(object):
         :returns: None
         :raises: Exception, errors.AssignIPError
         """
+        self.bulk_assign_ips(nodes_ids, [network_name])
 
-        cluster_id = db().query(Node).get(nodes_ids[0]).cluster_id
+    def bulk_assign_ips(self, nodes_ids, networks_names):
+        """Idempotent assignment IP addresses to nodes
+        from several networks at once.
+
+        Nodes which don't have IP address from the network
+        are found with one query per network, addresses for
+        all of them are allocated in one pass and inserted
+        in a single transaction.
+
+        :param node_ids: List of nodes IDs in database.
+        :type  node_ids: list
+        :param networks_names: List of networks names
+        :type  networks_names: list
+        :returns: None
+        :raises: Exception, errors.AssignIPError
+        """
+        nodes_clusters = dict(
+            db().query(Node.id, Node.cluster_id).filter(
+                Node.id.in_(nodes_ids)
+            ).all()
+        )
+        cluster_id = nodes_clusters[nodes_ids[0]]
         for node_id in nodes_ids:
-            node = db().query(Node).get(node_id)
-            if node.cluster_id != cluster_id:
+            if nodes_clusters.get(node_id) != cluster_id:
                 raise Exception(
                     u"Node id='{0}' doesn't belong to cluster_id='{1}'".format(
                         node_id,
@@ -337,30 +383,29 @@ class NetworkManager(object):
                     )
                 )
 
-        network = db().query(Network).join(NetworkGroup).\
-            filter(NetworkGroup.cluster_id == cluster_id).\
-            filter_by(name=network_name).first()
-
-        if not network:
-            raise errors.AssignIPError(
-                u"Network '%s' for cluster_id=%s not found." %
-                (network_name, cluster_id)
-            )
+        for network_name in networks_names:
+            network = db().query(Network).join(NetworkGroup).\
+                filter(NetworkGroup.cluster_id == cluster_id).\
+                filter_by(name=network_name).first()
 
-        for node_id in nodes_ids:
-            node_ips = imap(
-                lambda i: i.ip_addr,
-                self._get_ips_except_admin(
-                    node_id=node_id,
-                    network_id=network.id
+            if not network:
+                raise errors.AssignIPError(
+                    u"Network '%s' for cluster_id=%s not found." %
+                    (network_name, cluster_id)
                 )
-            )
-            # check if any of node_ips in required ranges
 
-            ip_already_assigned = False
+            nodes_with_ips = set(
+                node_id for (node_id,) in self._filter_ips_in_ranges(
+                    db().query(IPAddr.node),
+                    network.network_group_id
+                ).filter(
+                    IPAddr.network == network.id
+                ).filter(IPAddr.node.in_(nodes_ids))
+            )
 
-            for ip in node_ips:
-                if self.check_ip_belongs_to_net(ip, network):
+            nodes_without_ips = []
+            for node_id in nodes_ids:
+                if node_id in nodes_with_ips:
                     logger.info(
                         u"Node id='{0}' already has an IP address "
                         "inside '{1}' network.".format(
@@ -368,27 +413,33 @@ class NetworkManager(object):
                             network.name
                         )
                     )
-                    ip_already_assigned = True
-                    break
+                else:
+                    nodes_without_ips.append(node_id)
 
-            if ip_already_assigned:
+            if not nodes_without_ips:
                 continue
 
-            # IP address has not been assigned, let's do it
+            # IP addresses have not been assigned, let's do it
             logger.info(
-                "Assigning IP for node '{0}' in network '{1}'".format(
-                    node_id,
+                "Assigning IPs for nodes {0} in network '{1}'".format(
+                    nodes_without_ips,
                     network_name
                 )
             )
-            free_ip = self.get_free_ips(network.network_group.id)[0]
-            ip_db = IPAddr(
-                network=network.id,
-                node=node_id,
-                ip_addr=free_ip
+            free_ips = self.get_free_ips(
+                network.network_group_id,
+                num=len(nodes_without_ips)
             )
-            db().add(ip_db)
-            db().commit()
+            for node_id, free_ip in zip(nodes_without_ips, free_ips):
+                ip_db = IPAddr(
+                    network=network.id,
+                    node=node_id,
+                    ip_addr=free_ip
+                )
+                db().add(ip_db)
+            # addresses are seen as used by next network
+            db().flush()
+        db().commit()
 
     def assign_vip(self, cluster_id, network_name):
         """Idempotent assignment VirtualIP addresses to cluster.
@@ -422,21 +473,18 @@ class NetworkManager(object):
                             (network_name, cluster_id))
 
         admin_net_id = self.get_admin_network_id()
-        cluster_ips = [ne.ip_addr for ne in db().query(IPAddr).filter_by(
-            network=network.id,
-            node=None
-        ).filter(
-            not_(IPAddr.network == admin_net_id)
-        ).all()]
-        # check if any of used_ips in required cidr: network.cidr
-        ips_belongs_to_net = False
-        for ip in cluster_ips:
-            if self.check_ip_belongs_to_net(ip, network):
-                ips_belongs_to_net = True
-                break
-
-        if ips_belongs_to_net:
-            vip = cluster_ips[0]
+        cluster_vip = self._filter_ips_in_ranges(
+            db().query(IPAddr.ip_addr).filter_by(
+                network=network.id,
+                node=None
+            ).filter(
+                not_(IPAddr.network == admin_net_id)
+            ),
+            network.network_group_id
+        ).order_by(IPAddr.id).first()
+
+        if cluster_vip:
+            vip = cluster_vip.ip_addr
         else:
             # IP address has not been assigned, let's do it
             vip = self.get_free_ips(network.network_group.id)[0]
@@ -480,40 +528,59 @@ class NetworkManager(object):
             yield chain([s.next()], s)
 
     def check_ip_belongs_to_net(self, ip_addr, network):
-        addr = IPAddress(ip_addr)
-        ipranges = imap(
-            lambda ir: IPRange(ir.first, ir.last),
-            network.network_group.ip_ranges
+        addr = int(IPAddress(ip_addr))
+        return any(
+            ir.first_int <= addr <= ir.last_int
+            for ir in network.network_group.ip_ranges
         )
-        for r in ipranges:
-            if addr in r:
-                return True
-        return False
+
+    def _filter_ips_in_ranges(self, query, network_group_id):
+        """Filters query of IP addresses by ranges of Network Group.
+
+        :param query: Query of IPAddr or its columns.
+        :param network_group_id: NetworkGroup database ID.
+        :returns: Query
+        """
+        return query.join(IPAddrRange, and_(
+            IPAddrRange.network_group_id == network_group_id,
+            IPAddr.ip_addr_int.between(
+                IPAddrRange.first_int,
+                IPAddrRange.last_int
+            )
+        ))
 
     def _iter_free_ips(self, network_group):
         """Represents iterator over free IP addresses
-        in all ranges for given Network Group
+        in all ranges for given Network Group. Used addresses
+        of every range are found with one indexed range query.
+
+        :param network_group: NetworkGroup object.
+        :type  network_group: NetworkGroup
+        :yields: IPAddress
         """
-        for ip_addr in ifilter(
-            lambda ip: db().query(IPAddr).filter_by(
-                ip_addr=str(ip)
-            ).first() is None and not ip == network_group.gateway,
-            chain(*[
-                IPRange(ir.first, ir.last)
-                for ir in network_group.ip_ranges
-            ])
-        ):
-            yield ip_addr
+        gateway = None
+        if network_group.gateway:
+            gateway = int(IPAddress(network_group.gateway))
+        for ir in network_group.ip_ranges:
+            used_ips = iter(
+                db().query(IPAddr.ip_addr_int).filter(
+                    IPAddr.ip_addr_int.between(ir.first_int, ir.last_int)
+                ).distinct().order_by(IPAddr.ip_addr_int)
+            )
+            used = next(used_ips, None)
+            for ip in xrange(ir.first_int, ir.last_int + 1):
+                if used is not None and used[0] == ip:
+                    used = next(used_ips, None)
+                elif ip != gateway:
+                    yield IPAddress(ip)
 
     def get_free_ips(self, network_group_id, num=1):
-        """Returns list of free IP addresses for given Network Group
+        """Returns list of free IP addresses for given Network Group.
         """
         ng = db().query(NetworkGroup).get(network_group_id)
-        free_ips = []
-        for ip in self._iter_free_ips(ng):
-            free_ips.append(str(ip))
-            if len(free_ips) == num:
-                break
+        free_ips = [
+            str(ip) for ip in islice(self._iter_free_ips(ng), num)
+        ]
         if len(free_ips) < num:
             raise errors.OutOfIPs()
         return free_ips
@@ -544,30 +611,6 @@ class NetworkManager(object):
                 return free_ips
         raise errors.OutOfIPs()
 
-    def _get_ips_except_admin(self, node_id=None, network_id=None):
-        """Method for receiving IP addresses for node or network
-        excluding Admin Network IP address.
-
-        :param node_id: Node database ID.
-        :type  node_id: int
-        :param network_id: Network database ID.
-        :type  network_id: int
-        :returns: List of free IP addresses as SQLAlchemy objects.
-        """
-        ips = db().query(IPAddr).order_by(IPAddr.id)
-        if node_id:
-            ips = ips.filter_by(node=node_id)
-        if network_id:
-            ips = ips.filter_by(network=network_id)
-
-        admin_net_id = self.get_admin_network_id(False)
-        if admin_net_id:
-            ips = ips.filter(
-                not_(IPAddr.network == admin_net_id)
-            )
-
-        return ips.all()
-
     def get_main_nic(self, node_id):
         node_db = db().query(Node).get(node_id)
         for nic in node_db.interfaces:
@@ -640,72 +683,165 @@ class NetworkManager(object):
         :type  node_id: int
         :returns: List of network info for node.
         """
-        node_db = db().query(Node).get(node_id)
-        cluster_db = node_db.cluster
-        if cluster_db is None:
-            # Node doesn't belong to any cluster, so it should not have nets
-            return []
-
-        ips = self._get_ips_except_admin(node_id=node_id)
-        network_data = []
-        network_ids = []
-        for i in ips:
-            net = db().query(Network).get(i.network)
-            interface = self._get_interface_by_network_name(
-                node_db.id,
-                net.name
-            )
+        return self.get_nodes_networks([node_id])[node_id]
 
-            # Get prefix from netmask instead of cidr
-            # for public network
-            if net.name == 'public':
-                network_group = db().query(NetworkGroup).get(
-                    net.network_group_id)
+    def get_cluster_nodes_networks(self, cluster_id):
+        """Method for receiving network data for all nodes of cluster.
 
-                # Convert netmask to prefix
-                prefix = str(IPNetwork(
-                    '0.0.0.0/' + network_group.netmask).prefixlen)
-                netmask = network_group.netmask
-            else:
-                prefix = str(IPNetwork(net.cidr).prefixlen)
-                netmask = str(IPNetwork(net.cidr).netmask)
-
-            network_data.append({
-                'name': net.name,
-                'vlan': net.vlan_id,
-                'ip': i.ip_addr + '/' + prefix,
-                'netmask': netmask,
-                'brd': str(IPNetwork(net.cidr).broadcast),
-                'gateway': net.gateway,
-                'dev': interface.name})
-            network_ids.append(net.id)
-
-        # And now let's add networks w/o IP addresses
-        nets = db().query(Network).join(NetworkGroup).\
-            filter(NetworkGroup.cluster_id == cluster_db.id)
-        if network_ids:
-            nets = nets.filter(not_(Network.id.in_(network_ids)))
-
-        # For now, we pass information about all networks,
-        #    so these vlans will be created on every node we call this func for
-        # However it will end up with errors if we precreate vlans in VLAN mode
-        #   in fixed network. We are skipping fixed nets in Vlan mode.
-        for net in nets.order_by(Network.id).all():
-            interface = self._get_interface_by_network_name(
-                node_db.id,
-                net.name
-            )
+        :param cluster_id: Cluster database ID.
+        :type  cluster_id: int
+        :returns: Dict {node_id: list of network info for node}.
+        """
+        nodes_ids = [
+            node_id for (node_id,) in
+            db().query(Node.id).filter_by(cluster_id=cluster_id)
+        ]
+        return self.get_nodes_networks(nodes_ids)
+
+    def get_nodes_interfaces_names(self, nodes_ids):
+        """Method for receiving names of interfaces which networks
+        are assigned to, for many nodes at once.
+
+        :param nodes_ids: List of nodes database IDs.
+        :type  nodes_ids: list
+        :returns: Dict {node_id: {network_name: interface_name}}.
+        """
+        nodes_ifaces = {}
+        if not nodes_ids:
+            return nodes_ifaces
+        for node_id, iface_name, net_name in db().query(
+            NodeNICInterface.node_id,
+            NodeNICInterface.name,
+            NetworkGroup.name
+        ).join(
+            NetworkAssignment,
+            NetworkAssignment.interface_id == NodeNICInterface.id
+        ).join(
+            NetworkGroup,
+            NetworkGroup.id == NetworkAssignment.network_id
+        ).filter(
+            NodeNICInterface.node_id.in_(nodes_ids)
+        ).order_by(NodeNICInterface.id):
+            nodes_ifaces.setdefault(node_id, {}).setdefault(
+                net_name, iface_name)
+        return nodes_ifaces
+
+    def get_nodes_networks(self, nodes_ids, nodes_ifaces=None):
+        """Method for receiving network data for many nodes at once.
+        Nodes, IP addresses, networks, network groups and interface
+        assignments are fetched with fixed number of queries
+        which doesn't depend on number of nodes and networks.
+
+        :param nodes_ids: List of nodes database IDs.
+        :type  nodes_ids: list
+        :param nodes_ifaces: Result of get_nodes_interfaces_names
+        if it is already received.
+        :type  nodes_ifaces: dict
+        :returns: Dict {node_id: list of network info for node}.
+        :raises: errors.CanNotFindInterface
+        """
+        if not nodes_ids:
+            return {}
+
+        nodes = db().query(Node).filter(Node.id.in_(nodes_ids)).all()
+        clusters_ids = set(n.cluster_id for n in nodes if n.cluster_id)
+        if not clusters_ids:
+            # Nodes don't belong to any cluster, so they should not have nets
+            return dict((n.id, []) for n in nodes)
+
+        net_managers = dict(
+            db().query(Cluster.id, Cluster.net_manager).filter(
+                Cluster.id.in_(clusters_ids)
+            ).all()
+        )
 
-            if net.name == 'fixed' and cluster_db.net_manager == 'VlanManager':
+        ips = db().query(IPAddr, Network, NetworkGroup).join(
+            Network, IPAddr.network == Network.id
+        ).outerjoin(
+            NetworkGroup, Network.network_group_id == NetworkGroup.id
+        ).filter(
+            IPAddr.node.in_(nodes_ids)
+        )
+        admin_net_id = self.get_admin_network_id(False)
+        if admin_net_id:
+            ips = ips.filter(not_(IPAddr.network == admin_net_id))
+        nodes_ips = {}
+        for ip, net, ng in ips.order_by(IPAddr.id):
+            nodes_ips.setdefault(ip.node, []).append((ip, net, ng))
+
+        clusters_nets = {}
+        for net, cluster_id in db().query(
+            Network, NetworkGroup.cluster_id
+        ).join(NetworkGroup).filter(
+            NetworkGroup.cluster_id.in_(clusters_ids)
+        ).order_by(Network.id):
+            clusters_nets.setdefault(cluster_id, []).append(net)
+
+        if nodes_ifaces is None:
+            nodes_ifaces = self.get_nodes_interfaces_names(nodes_ids)
+
+        def _get_interface_name(node_id, network_name):
+            try:
+                return nodes_ifaces[node_id][network_name]
+            except KeyError:
+                raise errors.CanNotFindInterface()
+
+        result = {}
+        for node_db in nodes:
+            if node_db.cluster_id is None:
+                result[node_db.id] = []
                 continue
-            network_data.append({
-                'name': net.name,
-                'vlan': net.vlan_id,
-                'dev': interface.name})
-
-        network_data.append(self._get_admin_network(node_db))
 
-        return network_data
+            network_data = []
+            network_ids = set()
+            for i, net, network_group in nodes_ips.get(node_db.id, []):
+                dev = _get_interface_name(node_db.id, net.name)
+
+                # Get prefix from netmask instead of cidr
+                # for public network
+                if net.name == 'public':
+                    # Convert netmask to prefix
+                    prefix = str(IPNetwork(
+                        '0.0.0.0/' + network_group.netmask).prefixlen)
+                    netmask = network_group.netmask
+                else:
+                    prefix = str(IPNetwork(net.cidr).prefixlen)
+                    netmask = str(IPNetwork(net.cidr).netmask)
+
+                network_data.append({
+                    'name': net.name,
+                    'vlan': net.vlan_id,
+                    'ip': i.ip_addr + '/' + prefix,
+                    'netmask': netmask,
+                    'brd': str(IPNetwork(net.cidr).broadcast),
+                    'gateway': net.gateway,
+                    'dev': dev})
+                network_ids.add(net.id)
+
+            # And now let's add networks w/o IP addresses
+            net_manager = net_managers[node_db.cluster_id]
+            # For now, we pass information about all networks,
+            #    so these vlans will be created on every node
+            #    we call this func for
+            # However it will end up with errors if we precreate vlans
+            #   in VLAN mode in fixed network. We are skipping fixed nets
+            #   in Vlan mode.
+            for net in clusters_nets.get(node_db.cluster_id, []):
+                if net.id in network_ids:
+                    continue
+                dev = _get_interface_name(node_db.id, net.name)
+
+                if net.name == 'fixed' and net_manager == 'VlanManager':
+                    continue
+                network_data.append({
+                    'name': net.name,
+                    'vlan': net.vlan_id,
+                    'dev': dev})
+
+            network_data.append(self._get_admin_network(node_db))
+            result[node_db.id] = network_data
+
+        return result
 
     def _update_attrs(self, node_data):
         node_db = db().query(Node).get(node_data['id'])
@@ -813,18 +949,6 @@ class NetworkManager(object):
 
         raise errors.CanNotFindInterface()
 
-    def _get_interface_by_network_name(self, node_id, network_name):
-        """Return network device which has appointed
-        network with specified network name
-        """
-        node_db = db().query(Node).get(node_id)
-        for interface in node_db.interfaces:
-            for network in interface.assigned_networks:
-                if network.name == network_name:
-                    return interface
-
-        raise errors.CanNotFindInterface()
-
     def get_end_point_ip(self, cluster_id):
         cluster_db = db().query(Cluster).get(cluster_id)
         ip = None
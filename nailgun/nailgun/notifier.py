@@ -14,7 +14,11 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+from contextlib import contextmanager
 from datetime import datetime
+import threading
+
+import web
 
 from nailgun.api.models import Notification
 from nailgun.api.models import Task
@@ -23,11 +27,27 @@ from nailgun.errors import errors
 from nailgun.logger import logger
 
 
+# Notifications collected within buffered block of current thread
+_buffer = threading.local()
+
+
 def notify(topic, message,
            cluster_id=None, node_id=None, task_uuid=None):
     if topic == 'discover' and node_id is None:
         raise errors.CannotFindNodeIDForDiscovering(
             "No node id in discover notification")
+
+    if getattr(_buffer, 'notifications', None) is not None:
+        _buffer.notifications.append({
+            'topic': topic,
+            'message': message,
+            'cluster_id': cluster_id,
+            'node_id': node_id,
+            'task_uuid': task_uuid,
+            'datetime': datetime.now()
+        })
+        return
+
     task = None
     if task_uuid:
         task = db().query(Task).filter_by(uuid=task_uuid).first()
@@ -54,3 +74,92 @@ def notify(topic, message,
         logger.info(
             "Notification: topic: %s message: %s" % (topic, message)
         )
+
+
+@contextmanager
+def buffered(flush_on=()):
+    """Notifications created within block are collected,
+    deduplicated and stored with one insert when block
+    is finished without errors. Caller should commit them.
+
+    :param flush_on: exceptions after which collected
+        notifications are stored anyway
+    """
+    if getattr(_buffer, 'notifications', None) is not None:
+        # already buffered by outer block
+        yield
+        return
+
+    notifications = _buffer.notifications = []
+    succeeded = False
+    try:
+        yield
+        succeeded = True
+    except flush_on:
+        succeeded = True
+        raise
+    finally:
+        _buffer.notifications = None
+        if succeeded:
+            flush(notifications)
+
+
+def flush(notifications):
+    """Stores notifications with one insert, notifications
+    for the same node and task with the same message
+    are stored only once, as in notify
+    """
+    if not notifications:
+        return
+
+    tasks_ids = {}
+    tasks_uuids = set(n['task_uuid'] for n in notifications if n['task_uuid'])
+    if tasks_uuids:
+        tasks_ids = dict(db().query(Task.uuid, Task.id).filter(
+            Task.uuid.in_(tasks_uuids)
+        ))
+
+    rows = []
+    seen = set()
+    for n in notifications:
+        row = dict(n, task_id=tasks_ids.get(n['task_uuid']))
+        del row['task_uuid']
+        if row['node_id'] and row['task_id']:
+            key = (row['node_id'], row['message'], row['task_id'])
+            if key in seen:
+                continue
+            seen.add(key)
+        rows.append(row)
+
+    if seen:
+        exist = set(db().query(
+            Notification.node_id,
+            Notification.message,
+            Notification.task_id
+        ).filter(
+            Notification.task_id.in_(set(key[2] for key in seen))
+        ).filter(
+            Notification.node_id.in_(set(key[0] for key in seen))
+        ))
+        rows = filter(
+            lambda r: (r['node_id'], r['message'], r['task_id'])
+            not in exist,
+            rows
+        )
+
+    if rows:
+        db().execute(Notification.__table__.insert(), rows)
+    for row in rows:
+        logger.info(
+            "Notification: topic: %s message: %s",
+            row['topic'], row['message']
+        )
+
+
+def buffer_notifications(handler):
+    """Web processor which buffers notifications
+    created while handling request
+    """
+    # responses like 202 Accepted are sent with HTTPError
+    with buffered(flush_on=web.HTTPError):
+        return handler()
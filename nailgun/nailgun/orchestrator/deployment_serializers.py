@@ -48,6 +48,43 @@ class Priority(object):
         return self.priority
 
 
+class SerializationContext(object):
+    """Per-serialization storage of node data which
+    is received from database once and then shared
+    between serializer methods.
+    """
+
+    def __init__(self, nodes):
+        self.nodes = list(nodes)
+        nodes_ids = [n.id for n in self.nodes]
+        netmanager = NetworkManager()
+        self.interfaces = netmanager.get_nodes_interfaces_names(nodes_ids)
+        self.network_data = netmanager.get_nodes_networks(
+            nodes_ids, self.interfaces)
+        self.addresses = {}
+
+    def get_network_data(self, node):
+        return self.network_data[node.id]
+
+    def get_interface_name(self, node_id, network_name):
+        try:
+            return self.interfaces[node_id][network_name]
+        except KeyError:
+            raise errors.CanNotFindInterface()
+
+    def get_addresses(self, node, get_addr):
+        """Addresses of node in management, storage and
+        public networks, computed once per node
+        """
+        if node.id not in self.addresses:
+            network_data = self.get_network_data(node)
+            self.addresses[node.id] = dict(
+                (name, get_addr(network_data, name))
+                for name in ('management', 'storage', 'public')
+            )
+        return self.addresses[node.id]
+
+
 class OrchestratorSerializer(object):
     """Base class for orchestrator searilization."""
 
@@ -56,28 +93,49 @@ class OrchestratorSerializer(object):
         """Method generates facts which
         through an orchestrator passes to puppet
         """
-        common_attrs = cls.get_common_attrs(cluster)
-        nodes = cls.serialize_nodes(cls.get_nodes_to_serialization(cluster))
+        return cls.merge_facts(cls.serialize_compact(cluster))
+
+    @classmethod
+    def serialize_compact(cls, cluster):
+        """Method generates facts in compact form: common
+        attributes are kept once and are not merged into
+        attributes of every node
+        """
+        context = SerializationContext(
+            cls.get_nodes_to_serialization(cluster))
+        common_attrs = cls.get_common_attrs(cluster, context)
+        nodes = cls.serialize_nodes(context.nodes, context)
 
         if cluster.net_manager == 'VlanManager':
-            cls.add_vlan_interfaces(nodes)
+            cls.add_vlan_interfaces(nodes, context)
 
         cls.set_deployment_priorities(nodes)
 
-        # Merge attributes of nodes with common attributes
+        return {'common_attrs': common_attrs, 'nodes': nodes}
+
+    @classmethod
+    def merge_facts(cls, compact_facts):
+        """Merge attributes of nodes with common attributes,
+        common attributes take precedence
+        """
+        common_attrs = compact_facts['common_attrs']
+
         def merge(dict1, dict2):
             return dict(dict1.items() + dict2.items())
 
         return map(
             lambda node: merge(node, common_attrs),
-            nodes)
+            compact_facts['nodes'])
 
     @classmethod
-    def get_common_attrs(cls, cluster):
+    def get_common_attrs(cls, cluster, context=None):
         """Common attributes for all facts
         """
+        if context is None:
+            context = SerializationContext(
+                cls.get_nodes_to_serialization(cluster))
         attrs = cls.serialize_cluster_attrs(cluster)
-        attrs['nodes'] = cls.node_list(cls.get_nodes_to_serialization(cluster))
+        attrs['nodes'] = cls.node_list(context.nodes, context)
 
         for node in attrs['nodes']:
             if node['role'] in 'cinder':
@@ -126,19 +184,20 @@ class OrchestratorSerializer(object):
         return attrs
 
     @classmethod
-    def add_vlan_interfaces(cls, nodes):
+    def add_vlan_interfaces(cls, nodes, context=None):
         """Assign fixed_interfaces and vlan_interface.
         They should be equal.
         """
-        netmanager = NetworkManager()
+        if context is None:
+            context = SerializationContext(
+                db().query(Node).filter(
+                    Node.id.in_([int(node['uid']) for node in nodes])))
         for node in nodes:
-            node_db = db().query(Node).get(node['uid'])
-
-            fixed_interface = netmanager._get_interface_by_network_name(
-                node_db.id, 'fixed')
+            fixed_interface = context.get_interface_name(
+                int(node['uid']), 'fixed')
 
-            node['fixed_interface'] = fixed_interface.name
-            node['vlan_interface'] = fixed_interface.name
+            node['fixed_interface'] = fixed_interface
+            node['vlan_interface'] = fixed_interface
 
     @classmethod
     def network_ranges(cls, cluster):
@@ -170,26 +229,30 @@ class OrchestratorSerializer(object):
         ]
 
     @classmethod
-    def serialize_nodes(cls, nodes):
+    def serialize_nodes(cls, nodes, context=None):
         """Serialize node for each role.
         For example if node has two roles then
         in orchestrator will be passed two serialized
         nodes.
         """
+        if context is None:
+            context = SerializationContext(nodes)
         serialized_nodes = []
         for node in nodes:
             for role in set(node.pending_roles + node.roles):
-                serialized_node = cls.serialize_node(node, role)
+                serialized_node = cls.serialize_node(node, role, context)
                 serialized_nodes.append(serialized_node)
 
         return serialized_nodes
 
     @classmethod
-    def serialize_node(cls, node, role):
+    def serialize_node(cls, node, role, context=None):
         """Serialize node, then it will be
         merged with common attributes
         """
-        network_data = node.network_data
+        if context is None:
+            context = SerializationContext([node])
+        network_data = context.get_network_data(node)
         interfaces = cls.configure_interfaces(network_data)
         cls.__add_hw_interfaces(interfaces, node.meta['interfaces'])
         node_attrs = {
@@ -211,14 +274,16 @@ class OrchestratorSerializer(object):
         return node_attrs
 
     @classmethod
-    def node_list(cls, nodes):
+    def node_list(cls, nodes, context=None):
         """Generate nodes list. Represents
         as "nodes" parameter in facts.
         """
+        if context is None:
+            context = SerializationContext(nodes)
         node_list = []
 
         for node in nodes:
-            network_data = node.network_data
+            addresses = context.get_addresses(node, cls.get_addr)
 
             for role in set(node.pending_roles + node.roles):
                 node_list.append({
@@ -229,18 +294,12 @@ class OrchestratorSerializer(object):
                     'role': role,
 
                     # Addresses
-                    'internal_address': cls.get_addr(network_data,
-                                                     'management')['ip'],
-                    'internal_netmask': cls.get_addr(network_data,
-                                                     'management')['netmask'],
-                    'storage_address': cls.get_addr(network_data,
-                                                    'storage')['ip'],
-                    'storage_netmask': cls.get_addr(network_data,
-                                                    'storage')['netmask'],
-                    'public_address': cls.get_addr(network_data,
-                                                   'public')['ip'],
-                    'public_netmask': cls.get_addr(network_data,
-                                                   'public')['netmask']})
+                    'internal_address': addresses['management']['ip'],
+                    'internal_netmask': addresses['management']['netmask'],
+                    'storage_address': addresses['storage']['ip'],
+                    'storage_netmask': addresses['storage']['netmask'],
+                    'public_address': addresses['public']['ip'],
+                    'public_netmask': addresses['public']['netmask']})
 
         return node_list
 
@@ -359,12 +418,12 @@ class OrchestratorSerializer(object):
 class OrchestratorHASerializer(OrchestratorSerializer):
 
     @classmethod
-    def serialize(cls, cluster):
-        serialized_nodes = super(
-            OrchestratorHASerializer, cls).serialize(cluster)
-        cls.set_primary_controller(serialized_nodes)
+    def serialize_compact(cls, cluster):
+        compact_facts = super(
+            OrchestratorHASerializer, cls).serialize_compact(cluster)
+        cls.set_primary_controller(compact_facts['nodes'])
 
-        return serialized_nodes
+        return compact_facts
 
     @classmethod
     def set_primary_controller(cls, nodes):
@@ -383,10 +442,11 @@ class OrchestratorHASerializer(OrchestratorSerializer):
             controllers[0]['role'] = 'primary-controller'
 
     @classmethod
-    def node_list(cls, nodes):
+    def node_list(cls, nodes, context=None):
         """Node list
         """
-        node_list = super(OrchestratorHASerializer, cls).node_list(nodes)
+        node_list = super(OrchestratorHASerializer, cls).node_list(
+            nodes, context)
 
         for node in node_list:
             node['swift_zone'] = node['uid']
@@ -394,11 +454,11 @@ class OrchestratorHASerializer(OrchestratorSerializer):
         return node_list
 
     @classmethod
-    def get_common_attrs(cls, cluster):
+    def get_common_attrs(cls, cluster, context=None):
         """Common attributes for all facts
         """
         common_attrs = super(OrchestratorHASerializer, cls).get_common_attrs(
-            cluster)
+            cluster, context)
 
         netmanager = NetworkManager()
         common_attrs['management_vip'] = netmanager.assign_vip(
@@ -461,8 +521,11 @@ class OrchestratorHASerializer(OrchestratorSerializer):
             n['priority'] = other_nodes_prior
 
 
-def serialize(cluster):
-    """Serialization depends on deployment mode
+def serialize(cluster, compact=False):
+    """Serialization depends on deployment mode.
+    If compact is True, returns dict with common attributes
+    and list of node specific attributes, which orchestrator
+    merges by itself.
     """
     cluster.prepare_for_deployment()
 
@@ -472,4 +535,6 @@ def serialize(cluster):
         # Same serializer for all ha
         serializer = OrchestratorHASerializer
 
+    if compact:
+        return serializer.serialize_compact(cluster)
     return serializer.serialize(cluster)
@@ -15,11 +15,17 @@
 #    under the License.
 
 import json
+import threading
+import weakref
 
 from kombu import Connection
 from kombu import Exchange
+from kombu.pools import producers
 from kombu import Queue
+from sqlalchemy import event
+from sqlalchemy.orm import Session
 
+from nailgun.db import db
 from nailgun.logger import logger
 from nailgun.settings import settings
 
@@ -59,14 +65,113 @@ nailgun_queue = Queue(
 )
 
 
+# Publishing is retried on connection errors,
+# connection is reestablished transparently
+retry_policy = {
+    'max_retries': 5,
+    'interval_start': 0,
+    'interval_step': 1,
+    'interval_max': 5,
+}
+
+_connection = None
+_connection_lock = threading.Lock()
+
+
+def get_connection():
+    """Returns process-wide connection which is used as a key
+    for kombu connection and producer pools, so producers
+    and their connections are reused between casts
+    """
+    global _connection
+    with _connection_lock:
+        if _connection is None:
+            _connection = Connection(conn_str)
+        return _connection
+
+
+def reset_connection():
+    """Releases pooled producers and connections,
+    next cast will establish new connection
+    """
+    global _connection
+    with _connection_lock:
+        if _connection is not None:
+            producers[_connection].force_close_all()
+            del producers[_connection]
+            _connection.release()
+        _connection = None
+
+
+class LazyDump(object):
+    """Serializes message only when it is really logged
+    """
+
+    def __init__(self, message):
+        self.message = message
+
+    def __str__(self):
+        return json.dumps(self.message, indent=4)
+
+
+# Is set when new messages are committed to outbox
+outbox_ready = threading.Event()
+
+# Sessions with messages added to outbox in current transaction
+_outbox_sessions = weakref.WeakKeyDictionary()
+
+
+def _after_commit(session):
+    if _outbox_sessions.pop(session, False):
+        outbox_ready.set()
+
+
+def _after_rollback(session):
+    _outbox_sessions.pop(session, None)
+
+
+# publisher is woken up only when messages become visible to it
+event.listen(Session, 'after_commit', _after_commit)
+event.listen(Session, 'after_rollback', _after_rollback)
+
+
+def acquire_producer():
+    return producers[get_connection()].acquire(block=True)
+
+
+def publish(name, message, producer=None):
+    """Publishes message to orchestrator immediately
+
+    :param name: routing key
+    :param message: message body
+    :param producer: producer acquired with acquire_producer,
+        new one is acquired from pool if not specified
+    """
+    if producer is None:
+        with acquire_producer() as producer:
+            return publish(name, message, producer)
+
+    logger.debug("RPC cast to orchestrator:\n%s", LazyDump(message))
+    # queue is declared once per pooled connection,
+    # kombu caches declared entities
+    producer.publish(message,
+                     serializer='json',
+                     exchange=naily_exchange,
+                     routing_key=name,
+                     declare=[naily_queue],
+                     retry=True,
+                     retry_policy=retry_policy)
+
+
 def cast(name, message):
-    logger.debug(
-        "RPC cast to orchestrator:\n{0}".format(
-            json.dumps(message, indent=4)
-        )
-    )
-    with Connection(conn_str) as conn:
-        with conn.Producer(serializer='json') as producer:
-            producer.publish(message,
-                             exchange=naily_exchange, routing_key=name,
-                             declare=[naily_queue])
+    """Sends message to orchestrator. If outbox is enabled
+    message is stored within current transaction and
+    published by RPCPublisherThread after commit
+    """
+    if not settings.RPC_OUTBOX:
+        return publish(name, message)
+
+    from nailgun.api.models import RPCOutboxMessage
+    db().add(RPCOutboxMessage(routing_key=name, message=message))
+    db().flush()
+    _outbox_sessions[db()] = True
@@ -19,13 +19,17 @@ import itertools
 import json
 import netifaces
 import os
+import threading
 import traceback
 
 
 from sqlalchemy import or_
+from sqlalchemy.orm import joinedload
 
 from nailgun.api.models import IPAddr
+from nailgun.api.models import NetworkGroup
 from nailgun.api.models import Node
+from nailgun.api.models import NodeNICInterface
 from nailgun.api.models import Release
 from nailgun.api.models import Task
 from nailgun.db import db
@@ -40,8 +44,157 @@ class TaskNotFound(Exception):
     pass
 
 
+class NodesProgress(object):
+    """Average weighted progress of cluster nodes which
+    is updated incrementally by changed nodes
+    """
+
+    # node columns which node progress depends on, they are
+    # compared to find nodes changed outside of aggregate
+    state_columns = ('online', 'status', 'progress',
+                     'error_type', 'pending_deletion')
+
+    def __init__(self, nodes=()):
+        self.coeff = settings.PROVISIONING_PROGRESS_COEFF or 0.3
+        self.nodes = {}
+        # node id -> state of every aggregated node
+        self.states = {}
+        self.total = 0.0
+        for node in nodes:
+            self.update(node)
+
+    def node_progress(self, node):
+        """Returns weighted node progress or None
+        if node isn't taken into account
+        """
+        if node.status == "discover":
+            return 0
+        elif not node.online:
+            return 100
+        elif node.status in ['provisioning', 'provisioned'] or \
+                node.needs_reprovision:
+            return float(node.progress) * self.coeff
+        elif node.status in ['deploying', 'ready'] or \
+                node.needs_redeploy:
+            return 100.0 * self.coeff + \
+                float(node.progress) * (1.0 - self.coeff)
+
+    def update(self, node):
+        self.remove(node.id)
+        self.states[node.id] = tuple(
+            getattr(node, column) for column in self.state_columns
+        )
+        node_progress = self.node_progress(node)
+        if node_progress is not None:
+            self.nodes[node.id] = node_progress
+            self.total += node_progress
+
+    def remove(self, node_id):
+        self.states.pop(node_id, None)
+        self.total -= self.nodes.pop(node_id, None) or 0
+
+    @classmethod
+    def query_states(cls, cluster_id):
+        """Returns dict of node id -> state of cluster nodes
+        """
+        columns = [getattr(Node, column) for column in cls.state_columns]
+        return dict(
+            (row[0], tuple(row[1:])) for row in
+            db().query(Node.id, *columns).filter_by(cluster_id=cluster_id)
+        )
+
+    def outdated(self, states):
+        """Returns ids of nodes which were changed outside
+        of aggregate, e.g. marked offline by keepalive watcher,
+        updated by other RPC methods or API, added to cluster
+        or removed from it
+
+        :param states: dict of node id -> state of cluster nodes
+        """
+        return set(
+            node_id for node_id in set(states) | set(self.states)
+            if states.get(node_id) != self.states.get(node_id)
+        )
+
+    @property
+    def progress(self):
+        if self.nodes:
+            # rounding hides error accumulated by incremental updates
+            return int(round(self.total / len(self.nodes), 6))
+
+
 class NailgunReceiver(object):
 
+    # task uuid -> NodesProgress of deployed cluster
+    _nodes_progress = {}
+    # guards aggregates used by several RPC workers
+    _nodes_progress_lock = threading.Lock()
+
+    @classmethod
+    def _drop_nodes_progress(cls, task_uuid):
+        with cls._nodes_progress_lock:
+            cls._nodes_progress.pop(task_uuid, None)
+
+    @classmethod
+    def _evict_nodes_progress(cls):
+        """Drops aggregates of tasks which aren't running anymore,
+        whether they were finished, stopped or removed
+        """
+        uuids = cls._nodes_progress.keys()
+        if not uuids:
+            return
+        running = set(uuid for uuid, in db().query(Task.uuid).filter(
+            Task.uuid.in_(uuids)
+        ).filter_by(status='running'))
+        for uuid in uuids:
+            if uuid not in running:
+                cls._nodes_progress.pop(uuid, None)
+
+    @classmethod
+    def _update_nodes_progress(cls, task, nodes_db):
+        """Updates progress aggregate of task cluster nodes
+        by reported nodes and nodes changed since last message
+
+        :param task: deployment task
+        :param nodes_db: dict of node id -> reported node
+        :returns: aggregated progress of nodes
+        """
+        with cls._nodes_progress_lock:
+            return cls._do_update_nodes_progress(task, nodes_db)
+
+    @classmethod
+    def _do_update_nodes_progress(cls, task, nodes_db):
+        nodes_progress = cls._nodes_progress.get(task.uuid)
+        if nodes_progress is None:
+            cls._evict_nodes_progress()
+            nodes_progress = NodesProgress(
+                db().query(Node).filter_by(
+                    cluster_id=task.cluster_id
+                ).options(joinedload('pending_role_list'))
+            )
+            cls._nodes_progress[task.uuid] = nodes_progress
+        else:
+            outdated = nodes_progress.outdated(
+                NodesProgress.query_states(task.cluster_id)
+            ) - set(nodes_db)
+            if outdated:
+                changed = db().query(Node).filter(
+                    Node.id.in_(outdated)
+                ).filter_by(
+                    cluster_id=task.cluster_id
+                ).options(joinedload('pending_role_list')).all()
+                for node_id in outdated:
+                    nodes_progress.remove(node_id)
+                for node_db in changed:
+                    nodes_progress.update(node_db)
+
+        for node_db in nodes_db.itervalues():
+            if node_db.cluster_id == task.cluster_id:
+                nodes_progress.update(node_db)
+            else:
+                nodes_progress.remove(node_db.id)
+        return nodes_progress.progress
+
     @classmethod
     def remove_nodes_resp(cls, **kwargs):
         logger.info(
@@ -186,13 +339,31 @@ class NailgunReceiver(object):
                     task_uuid
                 )
             )
+            cls._drop_nodes_progress(task_uuid)
             return
         if not status:
             status = task.status
 
         # First of all, let's update nodes in database
+        nodes_db = {}
+        nodes_ids = [node['uid'] for node in nodes]
+        if nodes_ids:
+            nodes_db = dict(
+                (node_db.id, node_db) for node_db in
+                db().query(Node).filter(Node.id.in_(nodes_ids)).options(
+                    joinedload('pending_role_list')
+                )
+            )
+
+        update_fields = (
+            'error_msg',
+            'error_type',
+            'status',
+            'progress',
+            'online'
+        )
         for node in nodes:
-            node_db = db().query(Node).get(node['uid'])
+            node_db = nodes_db.get(int(node['uid']))
 
             if not node_db:
                 logger.warning(
@@ -202,72 +373,48 @@ class NailgunReceiver(object):
                 )
                 continue
 
-            update_fields = (
-                'error_msg',
-                'error_type',
-                'status',
-                'progress',
-                'online'
-            )
             for param in update_fields:
                 if param in node:
                     logger.debug(
-                        u"Updating node {0} - set {1} to {2}".format(
-                            node['uid'],
-                            param,
-                            node[param]
-                        )
+                        u"Updating node %s - set %s to %s",
+                        node['uid'],
+                        param,
+                        node[param]
                     )
                     setattr(node_db, param, node[param])
 
-                    if param == 'progress' and node.get('status') == 'error' \
-                            or node.get('online') is False:
-                        # If failure occurred with node
-                        # it's progress should be 100
-                        node_db.progress = 100
-                        # Setting node error_msg for offline nodes
-                        if node.get('online') is False \
-                                and not node_db.error_msg:
-                            node_db.error_msg = u"Node is offline"
-                        # Notification on particular node failure
-                        notifier.notify(
-                            "error",
-                            u"Failed to deploy node '{0}': {1}".format(
-                                node_db.name,
-                                node_db.error_msg or "Unknown error"
-                            ),
-                            cluster_id=task.cluster_id,
-                            node_id=node['uid'],
-                            task_uuid=task_uuid
-                        )
+            if 'progress' in node and node.get('status') == 'error' \
+                    or node.get('online') is False:
+                # If failure occurred with node
+                # it's progress should be 100
+                node_db.progress = 100
+                # Setting node error_msg for offline nodes
+                if node.get('online') is False \
+                        and not node_db.error_msg:
+                    node_db.error_msg = u"Node is offline"
+                # Notification on particular node failure
+                notifier.notify(
+                    "error",
+                    u"Failed to deploy node '{0}': {1}".format(
+                        node_db.name,
+                        node_db.error_msg or "Unknown error"
+                    ),
+                    cluster_id=task.cluster_id,
+                    node_id=node['uid'],
+                    task_uuid=task_uuid
+                )
 
             db().add(node_db)
-            db().commit()
+        db().commit()
 
         # We should calculate task progress by nodes info
-        task = db().query(Task).filter_by(uuid=task_uuid).first()
-        coeff = settings.PROVISIONING_PROGRESS_COEFF or 0.3
-        if nodes and not progress:
-            nodes_progress = []
-            nodes_db = db().query(Node).filter_by(
-                cluster_id=task.cluster_id).all()
-            for node in nodes_db:
-                if node.status == "discover":
-                    nodes_progress.append(0)
-                elif not node.online:
-                    nodes_progress.append(100)
-                elif node.status in ['provisioning', 'provisioned'] or \
-                        node.needs_reprovision:
-                    nodes_progress.append(float(node.progress) * coeff)
-                elif node.status in ['deploying', 'ready'] or \
-                        node.needs_redeploy:
-                    nodes_progress.append(
-                        100.0 * coeff + float(node.progress) * (1.0 - coeff)
-                    )
-            if nodes_progress:
-                progress = int(
-                    float(sum(nodes_progress)) / len(nodes_progress)
-                )
+        if nodes:
+            nodes_progress = cls._update_nodes_progress(task, nodes_db)
+            if not progress:
+                progress = nodes_progress
+
+        if status in ('error', 'ready'):
+            cls._drop_nodes_progress(task.uuid)
 
         # Let's check the whole task status
         if status in ('error',):
@@ -489,14 +636,13 @@ class NailgunReceiver(object):
                     error_msg = 'At least two nodes are required to be in '\
                                 'the environment for network verification.'
             else:
+                cached_nodes_by_uid = dict(
+                    (str(n['uid']), n) for n in cached_nodes
+                )
                 error_nodes = []
                 for node in nodes:
-                    cached_nodes_filtered = filter(
-                        lambda n: str(n['uid']) == str(node['uid']),
-                        cached_nodes
-                    )
-
-                    if not cached_nodes_filtered:
+                    cached_node = cached_nodes_by_uid.get(str(node['uid']))
+                    if not cached_node:
                         logger.warning(
                             "verify_networks_resp: arguments contain node "
                             "data which is not in the task cache: %r",
@@ -504,57 +650,41 @@ class NailgunReceiver(object):
                         )
                         continue
 
-                    cached_node = cached_nodes_filtered[0]
-
+                    received_networks = dict(
+                        (n['iface'], n) for n in node.get('networks', [])
+                    )
                     for cached_network in cached_node['networks']:
-                        received_networks_filtered = filter(
-                            lambda n: n['iface'] == cached_network['iface'],
-                            node.get('networks', [])
-                        )
-
-                        if received_networks_filtered:
-                            received_network = received_networks_filtered[0]
-                            absent_vlans = list(
-                                set(cached_network['vlans']) -
-                                set(received_network['vlans'])
+                        iface = cached_network['iface']
+                        received_network = received_networks.get(iface)
+
+                        if received_network:
+                            absent_vlans = sorted(
+                                NetworkGroup.expand_vlan_ids(
+                                    cached_network['vlans']
+                                ) - NetworkGroup.expand_vlan_ids(
+                                    received_network['vlans']
+                                )
                             )
                         else:
                             logger.warning(
                                 "verify_networks_resp: arguments don't contain"
                                 " data for interface: uid=%s iface=%s",
-                                node['uid'], cached_network['iface']
+                                node['uid'], iface
+                            )
+                            absent_vlans = sorted(
+                                NetworkGroup.expand_vlan_ids(
+                                    cached_network['vlans']
+                                )
                             )
-                            absent_vlans = cached_network['vlans']
 
                         if absent_vlans:
-                            data = {'uid': node['uid'],
-                                    'interface': received_network['iface'],
-                                    'absent_vlans': absent_vlans}
-                            node_db = db().query(Node).get(node['uid'])
-                            if node_db:
-                                data['name'] = node_db.name
-                                db_nics = filter(
-                                    lambda i:
-                                    i.name == received_network['iface'],
-                                    node_db.interfaces
-                                )
-                                if db_nics:
-                                    data['mac'] = db_nics[0].mac
-                                else:
-                                    logger.warning(
-                                        "verify_networks_resp: can't find "
-                                        "interface %r for node %r in DB",
-                                        received_network['iface'], node_db.id
-                                    )
-                                    data['mac'] = 'unknown'
-                            else:
-                                logger.warning(
-                                    "verify_networks_resp: can't find node "
-                                    "%r in DB",
-                                    node['uid']
-                                )
+                            error_nodes.append({
+                                'uid': node['uid'],
+                                'interface': iface,
+                                'absent_vlans': absent_vlans
+                            })
 
-                            error_nodes.append(data)
+                cls._add_nodes_nics_info(error_nodes)
 
                 if error_nodes:
                     result = error_nodes
@@ -569,6 +699,44 @@ class NailgunReceiver(object):
         TaskHelper.update_task_status(task_uuid, status,
                                       progress, error_msg, result)
 
+    @classmethod
+    def _add_nodes_nics_info(cls, error_nodes):
+        """Adds node names and MACs of interfaces
+        to verification errors using one query
+        """
+        if not error_nodes:
+            return
+        nodes_nics = collections.defaultdict(dict)
+        nodes_names = {}
+        for node_id, name, iface, mac in db().query(
+            Node.id, Node.name, NodeNICInterface.name, NodeNICInterface.mac
+        ).outerjoin(
+            (NodeNICInterface, NodeNICInterface.node_id == Node.id)
+        ).filter(
+            Node.id.in_(set(int(data['uid']) for data in error_nodes))
+        ):
+            nodes_names[node_id] = name
+            if iface:
+                nodes_nics[node_id][iface] = mac
+
+        for data in error_nodes:
+            node_id = int(data['uid'])
+            if node_id not in nodes_names:
+                logger.warning(
+                    "verify_networks_resp: can't find node %r in DB",
+                    data['uid']
+                )
+                continue
+            data['name'] = nodes_names[node_id]
+            data['mac'] = nodes_nics[node_id].get(data['interface'])
+            if not data['mac']:
+                logger.warning(
+                    "verify_networks_resp: can't find "
+                    "interface %r for node %r in DB",
+                    data['interface'], node_id
+                )
+                data['mac'] = 'unknown'
+
     @classmethod
     def _master_networks_gen(cls, ifaces):
         for iface in ifaces:
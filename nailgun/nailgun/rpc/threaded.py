@@ -14,39 +14,323 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import Queue
+import socket
 import threading
 import traceback
 
 from kombu import Connection
 from kombu.mixins import ConsumerMixin
 
+from nailgun.api.models import RPCOutboxMessage
+from nailgun.api.models import Task
 from nailgun.db import db
 from nailgun.logger import logger
+from nailgun import notifier
 import nailgun.rpc as rpc
 from nailgun.rpc.receiver import NailgunReceiver
+from nailgun.settings import settings
+from nailgun import sqlstats
+
+
+def process_msg(receiver, body):
+    with sqlstats.collect() as sql_stats:
+        try:
+            callback = getattr(receiver, body["method"])
+            with notifier.buffered():
+                callback(**body["args"])
+            db().commit()
+        except Exception:
+            logger.error(traceback.format_exc())
+            db().rollback()
+        finally:
+            db().expire_all()
+    if sql_stats:
+        source = "RPC method %s" % body.get("method")
+        logger.debug("%s: %s", source, sql_stats)
+        sql_stats.warn_repeated(logger, source)
+
+
+# Node fields which can be changed by progress-only message
+PROGRESS_NODE_FIELDS = set(['uid', 'progress', 'status'])
+
+
+def is_progress_msg(body):
+    """Checks if message only reports deployment progress
+    """
+    if body.get("method") != "deploy_resp":
+        return False
+    args = body.get("args", {})
+    if args.get("error") or args.get("status") in ('error', 'ready'):
+        return False
+    return all(
+        set(node) <= PROGRESS_NODE_FIELDS and node.get('status') != 'error'
+        for node in args.get("nodes") or []
+    )
+
+
+def supersedes(body, prev_body):
+    """Checks if body makes prev_body useless - both messages
+    are progress-only, report the same nodes and the same statuses,
+    so only progress is changed
+    """
+    if not (is_progress_msg(prev_body) and is_progress_msg(body)):
+        return False
+    args, prev_args = body["args"], prev_body["args"]
+    if args.get("status") != prev_args.get("status") or \
+            ("progress" in prev_args and "progress" not in args):
+        return False
+
+    def nodes_statuses(args):
+        return dict(
+            (node.get('uid'), (node.get('status'), 'progress' in node))
+            for node in args.get("nodes") or []
+        )
+    return nodes_statuses(args) == nodes_statuses(prev_args)
+
+
+def process_batch(receiver, items):
+    """Processes batch of received messages,
+    superseded progress messages are dropped
+
+    :param items: list of (body, msg)
+    """
+    for body in coalesce_msgs([body for body, msg in items]):
+        process_msg(receiver, body)
+
+
+def coalesce_msgs(bodies):
+    """Drops progress-only messages superseded by the next
+    message of the same task, order of the rest is kept
+    """
+    result = []
+    last_task_msg = {}
+    for body in bodies:
+        task_uuid = body.get("args", {}).get("task_uuid")
+        prev = last_task_msg.get(task_uuid)
+        if prev is not None and supersedes(body, result[prev]):
+            result[prev] = None
+        last_task_msg[task_uuid] = len(result)
+        result.append(body)
+    return [body for body in result if body is not None]
+
+
+class RPCWorker(threading.Thread):
+    """Processes messages from its own queue,
+    uses its own scoped session. Messages which are
+    already in queue are processed as a batch in which
+    superseded progress messages are dropped. Tokens of
+    processed messages are put into done queue to be
+    acknowledged by consumer thread, which owns the channel
+    """
+
+    def __init__(self, receiver, queue_size, done):
+        super(RPCWorker, self).__init__()
+        self.daemon = True
+        self.receiver = receiver
+        self.queue = Queue.Queue(queue_size)
+        self.done = done
+
+    def stop(self):
+        # worker stops when all queued messages are processed
+        self.queue.put(None)
+
+    def run(self):
+        try:
+            stopped = False
+            while not stopped:
+                items = [self.queue.get()]
+                while True:
+                    try:
+                        items.append(self.queue.get_nowait())
+                    except Queue.Empty:
+                        break
+                if None in items:
+                    stopped = True
+                    items = items[:items.index(None)]
+
+                try:
+                    process_batch(self.receiver, items)
+                finally:
+                    # dropped messages are done as well
+                    for body, token in items:
+                        self.done.put(token)
+        finally:
+            db.remove()
 
 
 class RPCConsumer(ConsumerMixin):
+    """Consumes orchestrator responses. With one worker messages
+    are processed in consumer thread, otherwise they are handed
+    to pool of RPCWorker threads. In both cases messages already
+    delivered are processed as a batch in which superseded progress
+    messages are dropped. Messages are acknowledged only after
+    they are processed, so prefetch count bounds number
+    of messages in progress
+    """
+
+    # seconds to wait for next delivered message
+    # before batch is processed in consumer thread
+    lookahead_timeout = 0.01
+    # seconds to wait for free place in worker queue
+    # before processed messages are acknowledged again
+    put_timeout = 1
+    # max number of cached routing keys of tasks
+    routing_cache_size = 1000
 
-    def __init__(self, connection, receiver):
+    def __init__(self, connection, receiver, workers=None, queue_size=None):
         self.connection = connection
         self.receiver = receiver
+        workers = max(int(workers or settings.RPC_CONSUMER_WORKERS), 1)
+        self.queue_size = int(queue_size or settings.RPC_CONSUMER_QUEUE_SIZE)
+        self.done = Queue.Queue()
+        # incremented when connection is revived, messages
+        # received from old channel can't be acknowledged
+        self.generation = 0
+        # task uuid -> routing key of its messages
+        self.routing_keys = {}
+        # messages received by consumer thread but not processed yet
+        self.pending = []
+        # connection established by consume loop
+        self.consumer_connection = None
+        self.stopped = False
+        self.workers = []
+        if workers > 1:
+            self.workers = [
+                RPCWorker(receiver, self.queue_size, self.done)
+                for _ in xrange(workers)
+            ]
+        for worker in self.workers:
+            worker.start()
 
     def get_consumers(self, Consumer, channel):
-        return [Consumer(queues=[rpc.nailgun_queue],
-                         callbacks=[self.consume_msg])]
+        consumer = Consumer(queues=[rpc.nailgun_queue],
+                            callbacks=[self.consume_msg])
+        # bound number of unacknowledged messages
+        consumer.qos(
+            prefetch_count=self.queue_size * max(len(self.workers), 1)
+        )
+        return [consumer]
 
-    def consume_msg(self, body, msg):
-        callback = getattr(self.receiver, body["method"])
+    def on_consume_ready(self, connection, channel, consumers, **kwargs):
+        self.consumer_connection = connection
+
+    def on_consume_end(self, connection, channel):
+        self.process_pending(lookahead=False)
+        if self.should_stop:
+            # messages in progress are acknowledged while
+            # channel is still open
+            self.stop_workers()
+        self.consumer_connection = None
+
+    def on_connection_revived(self):
+        self.generation += 1
+        self.pending = []
+        # drop messages of old channel
+        self.ack_done()
+
+    def get_worker(self, body):
+        """Messages of tasks of the same cluster are always processed
+        by the same worker, so they are processed in order and
+        subtasks of one supertask don't update it concurrently
+        """
+        task_uuid = body.get("args", {}).get("task_uuid")
+        key = self.routing_keys.get(task_uuid)
+        if key is None:
+            key = self.get_routing_key(task_uuid)
+            if len(self.routing_keys) >= self.routing_cache_size:
+                self.routing_keys.clear()
+            self.routing_keys[task_uuid] = key
+        return self.workers[hash(key) % len(self.workers)]
+
+    def get_routing_key(self, task_uuid):
+        """Returns cluster of task, supertask for tasks
+        without cluster or task uuid for unknown tasks
+        """
         try:
-            callback(**body["args"])
-            db().commit()
-        except Exception:
-            logger.error(traceback.format_exc())
+            task = db().query(
+                Task.id, Task.parent_id, Task.cluster_id
+            ).filter_by(uuid=task_uuid).first()
+        finally:
+            # don't keep transaction open in consumer thread
             db().rollback()
+        if task is None:
+            return ('uuid', task_uuid)
+        if task.cluster_id is not None:
+            return ('cluster', task.cluster_id)
+        return ('task', task.parent_id or task.id)
+
+    def consume_msg(self, body, msg):
+        if not self.workers:
+            # processed on next iteration of consume loop
+            self.pending.append((body, msg))
+            return
+        worker = self.get_worker(body)
+        while True:
+            self.ack_done()
+            try:
+                worker.queue.put((body, (self.generation, msg)),
+                                 timeout=self.put_timeout)
+                return
+            except Queue.Full:
+                # keep connection alive while worker is busy
+                if self.consumer_connection is not None:
+                    self.consumer_connection.heartbeat_check()
+
+    def process_pending(self, lookahead=True):
+        """Receives messages which are already delivered, up to
+        queue size, and processes them together with pending ones
+        in consumer thread
+
+        :param lookahead: receive delivered messages first
+        """
+        if not self.pending:
+            return
+        try:
+            while lookahead and self.consumer_connection and \
+                    len(self.pending) < self.queue_size:
+                self.consumer_connection.drain_events(
+                    timeout=self.lookahead_timeout
+                )
+        except socket.timeout:
+            pass
+        items, self.pending = self.pending, []
+        try:
+            process_batch(self.receiver, items)
         finally:
-            msg.ack()
-            db().expire_all()
+            for body, msg in items:
+                msg.ack()
+
+    def ack_done(self):
+        """Acknowledges messages processed by workers
+        """
+        while True:
+            try:
+                generation, msg = self.done.get_nowait()
+            except Queue.Empty:
+                break
+            if generation == self.generation:
+                msg.ack()
+
+    def on_iteration(self):
+        self.process_pending()
+        self.ack_done()
+
+    def stop_workers(self, ack=True):
+        """Waits until all received messages are processed
+
+        :param ack: acknowledge processed messages, False
+            if channel is already closed
+        """
+        if self.stopped:
+            return
+        self.stopped = True
+        for worker in self.workers:
+            worker.stop()
+        for worker in self.workers:
+            worker.join()
+        if ack:
+            self.ack_done()
 
 
 class RPCKombuThread(threading.Thread):
@@ -67,4 +351,71 @@ class RPCKombuThread(threading.Thread):
     def run(self):
         with Connection(rpc.conn_str) as conn:
             self.consumer = RPCConsumer(conn, self.receiver)
-            self.consumer.run()
+            try:
+                self.consumer.run()
+            finally:
+                # no-op if consumer stopped workers before
+                # its connection was closed
+                self.consumer.stop_workers(ack=False)
+
+
+class RPCPublisherThread(threading.Thread):
+    """Publishes messages stored in outbox by rpc.cast.
+    Messages are removed from outbox only after they
+    are published, so they survive broker outages and restarts
+    """
+
+    def __init__(self, batch_size=None, interval=None):
+        super(RPCPublisherThread, self).__init__()
+        self.stoprequest = threading.Event()
+        self.batch_size = batch_size or \
+            int(settings.RPC_OUTBOX_BATCH_SIZE)
+        self.interval = interval or \
+            float(settings.RPC_OUTBOX_POLL_INTERVAL)
+
+    def join(self, timeout=None):
+        self.stoprequest.set()
+        rpc.outbox_ready.set()
+        super(RPCPublisherThread, self).join(timeout)
+
+    def run(self):
+        while not self.stoprequest.isSet():
+            rpc.outbox_ready.wait(self.interval)
+            rpc.outbox_ready.clear()
+            self.publish_outbox()
+        # messages stored before stop request
+        self.publish_outbox()
+
+    def publish_outbox(self):
+        try:
+            while self.publish_batch():
+                pass
+        except Exception:
+            logger.error(traceback.format_exc())
+            db().rollback()
+        finally:
+            db().expire_all()
+
+    def publish_batch(self):
+        """Publishes one batch of messages from outbox
+
+        :returns: number of published messages
+        """
+        messages = db().query(RPCOutboxMessage).order_by(
+            RPCOutboxMessage.id
+        ).limit(self.batch_size).with_lockmode('update').all()
+        if not messages:
+            db().commit()
+            return 0
+
+        try:
+            with rpc.acquire_producer() as producer:
+                for message in messages:
+                    rpc.publish(message.routing_key, message.message,
+                                producer)
+                    db().delete(message)
+        finally:
+            # published messages are removed even if
+            # publishing of the rest of batch failed
+            db().commit()
+        return len(messages)
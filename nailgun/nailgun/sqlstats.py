@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+
+#    Copyright 2013 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Statistics of SQL statements executed per API request and RPC message:
+number of statements, time spent in database and statements repeated
+many times (N+1 queries)
+"""
+
+from collections import defaultdict
+from contextlib import contextmanager
+import re
+import threading
+import time
+
+from sqlalchemy import event
+
+from nailgun.settings import settings
+
+
+_local = threading.local()
+
+# list of bind parameters, e.g. in IN clause
+_params_list = re.compile(r'\(\s*%\(\w+\)s(?:\s*,\s*%\(\w+\)s)*\s*\)')
+
+
+class SQLStats(object):
+    """Statistics of SQL statements executed within context
+    of :func:`collect`
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+        self.statements = defaultdict(int)
+
+    def add(self, statement, duration):
+        self.count += 1
+        self.time += duration
+        self.statements[statement] += 1
+
+    def repeated(self, threshold=None):
+        """Returns shapes of statements executed at least *threshold*
+        times, statements of the same shape differ only in number
+        of bind parameters in lists
+
+        :param threshold: defaults to SQL_STATS_REPEAT_THRESHOLD
+        :returns: list of (shape, count), most repeated first
+        """
+        threshold = threshold or settings.SQL_STATS_REPEAT_THRESHOLD
+        shapes = defaultdict(int)
+        for statement, count in self.statements.iteritems():
+            shapes[_params_list.sub('(...)', statement)] += count
+        return sorted(
+            [(s, c) for s, c in shapes.iteritems() if c >= threshold],
+            key=lambda item: -item[1]
+        )
+
+    def headers(self):
+        """:returns: list of response headers with statistics
+        """
+        return [
+            ('X-SQL-Count', str(self.count)),
+            ('X-SQL-Time', '%.3f' % self.time),
+        ]
+
+    def warn_repeated(self, log, source):
+        """Logs warning about every repeated statement
+
+        :param log: logger
+        :param source: description of request or message
+        """
+        for shape, count in self.repeated():
+            log.warning("SQL statement executed %d times by %s: %s",
+                        count, source, shape)
+
+    def __str__(self):
+        return "%d SQL statements in %.3f s" % (self.count, self.time)
+
+
+@contextmanager
+def collect():
+    """Collects statistics of SQL statements executed by current
+    thread within context. Yields SQLStats object or None
+    if SQL_STATS is disabled.
+    """
+    if not settings.SQL_STATS:
+        yield None
+        return
+    previous = getattr(_local, 'stats', None)
+    _local.stats = stats = SQLStats()
+    try:
+        yield stats
+    finally:
+        _local.stats = previous
+
+
+def _before_cursor_execute(conn, cursor, statement,
+                           parameters, context, executemany):
+    if getattr(_local, 'stats', None) is not None:
+        conn.info['sqlstats_start'] = time.time()
+
+
+def _after_cursor_execute(conn, cursor, statement,
+                          parameters, context, executemany):
+    start = conn.info.pop('sqlstats_start', None)
+    stats = getattr(_local, 'stats', None)
+    if stats is not None and start is not None:
+        stats.add(statement, time.time() - start)
+
+
+def instrument(engine):
+    """Adds listeners collecting statistics to engine
+    """
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
@@ -24,6 +24,7 @@ from kombu import Connection
 from kombu import Exchange
 from kombu import Queue
 
+from nailgun.api.models import NetworkGroup
 from nailgun.api.models import Node
 from nailgun.api.models import NodeAttributes
 from nailgun.db import db
@@ -320,8 +321,9 @@ class FakeVerificationThread(FakeThread):
         # verification will fail if you specified 404 as VLAN id in any net
         for n in self.data['args']['nodes']:
             for iface in n['networks']:
-                if 404 in iface['vlans']:
-                    iface['vlans'] = list(set(iface['vlans']) ^ set([404]))
+                vlans = NetworkGroup.expand_vlan_ids(iface['vlans'])
+                if 404 in vlans:
+                    iface['vlans'] = list(vlans ^ set([404]))
 
         while not ready and not self.stoprequest.isSet():
             kwargs['progress'] += randrange(
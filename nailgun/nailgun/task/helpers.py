@@ -17,6 +17,8 @@
 import os
 import shutil
 
+from sqlalchemy.orm import joinedload
+
 from nailgun.api.models import IPAddr
 from nailgun.api.models import Task
 from nailgun.db import db
@@ -115,7 +117,13 @@ class TaskHelper(object):
         # verify_networks - task is expecting to receive result with
         # some data if connectivity_verification fails
         logger.debug("Updating task: %s", uuid)
-        task = db().query(Task).filter_by(uuid=uuid).first()
+        # task, its cluster, parent and siblings are loaded at once,
+        # all derived changes are made in session and committed once
+        task = db().query(Task).options(
+            joinedload('cluster'),
+            joinedload('parent'),
+            joinedload('parent.subtasks')
+        ).filter_by(uuid=uuid).first()
         if not task:
             logger.error("Can't set status='%s', message='%s':no task \
                     with UUID %s found!", status, msg, uuid)
@@ -135,20 +143,31 @@ class TaskHelper(object):
                     )
                 )
         db().add(task)
-        db().commit()
 
         if previous_status != status and task.cluster_id:
             logger.debug("Updating cluster status: "
                          "cluster_id: %s status: %s",
                          task.cluster_id, status)
-            cls.update_cluster_status(uuid)
+            cls._update_cluster_status(task)
         if task.parent:
             logger.debug("Updating parent task: %s.", task.parent.uuid)
-            cls.update_parent_task(task.parent.uuid)
+            cls._update_parent_task(task.parent)
+        db().commit()
 
     @classmethod
     def update_parent_task(cls, uuid):
-        task = db().query(Task).filter_by(uuid=uuid).first()
+        task = db().query(Task).options(
+            joinedload('cluster'),
+            joinedload('subtasks')
+        ).filter_by(uuid=uuid).first()
+        cls._update_parent_task(task)
+        db().commit()
+
+    @classmethod
+    def _update_parent_task(cls, task):
+        """Updates task status and progress by its subtasks
+        without commit
+        """
         subtasks = task.subtasks
         if len(subtasks):
             if all(map(lambda s: s.status == 'ready', subtasks)):
@@ -158,8 +177,7 @@ class TaskHelper(object):
                     lambda s: s.message, filter(
                         lambda s: s.message is not None, subtasks)))
                 db().add(task)
-                db().commit()
-                cls.update_cluster_status(uuid)
+                cls._update_cluster_status(task)
             elif all(map(lambda s: s.status in ('ready', 'error'), subtasks)):
                 task.status = 'error'
                 task.progress = 100
@@ -171,8 +189,7 @@ class TaskHelper(object):
                             s.message == 'Task aborted'
                         ), subtasks)))))
                 db().add(task)
-                db().commit()
-                cls.update_cluster_status(uuid)
+                cls._update_cluster_status(task)
             else:
                 subtasks_with_progress = filter(
                     lambda s: s.progress is not None,
@@ -193,11 +210,17 @@ class TaskHelper(object):
                 else:
                     task.progress = 0
                 db().add(task)
-                db().commit()
 
     @classmethod
     def update_cluster_status(cls, uuid):
         task = db().query(Task).filter_by(uuid=uuid).first()
+        cls._update_cluster_status(task)
+        db().commit()
+
+    @classmethod
+    def _update_cluster_status(cls, task):
+        """Updates cluster status by task status without commit
+        """
         # FIXME: should be moved to task/manager "finish" method after
         # web.ctx.orm issue is addressed
         cluster = task.cluster
@@ -215,7 +238,6 @@ class TaskHelper(object):
         elif task.name == 'provision':
             if task.status == 'error':
                 cls.__set_cluster_status(cluster, 'error')
-        db().commit()
 
     @classmethod
     def __set_cluster_status(cls, cluster, new_state):
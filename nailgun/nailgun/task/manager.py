@@ -22,6 +22,7 @@ from nailgun.api.models import Task
 from nailgun.api.serializers.network_configuration \
     import NetworkConfigurationSerializer
 from nailgun.db import db
+from nailgun.db import refresh
 from nailgun.errors import errors
 from nailgun.logger import logger
 import nailgun.rpc as rpc
@@ -132,8 +133,10 @@ class DeploymentTaskManager(TaskManager):
         current_tasks = db().query(Task).filter_by(
             cluster_id=self.cluster.id,
             name="deploy"
-        )
+        ).all()
         for task in current_tasks:
+            # status is changed by RPC receiver thread
+            refresh(task)
             if task.status == "running":
                 raise errors.DeploymentAlreadyStarted()
             elif task.status in ("ready", "error"):
@@ -392,6 +395,8 @@ class ClusterDeletionManager(TaskManager):
 
         logger.debug("Removing cluster tasks")
         for task in current_cluster_tasks:
+            # status is changed by RPC receiver thread
+            refresh(task)
             if task.status == "running":
                 raise errors.DeletionAlreadyStarted()
             elif task.status in ("ready", "error"):
@@ -523,8 +528,10 @@ class DumpTaskManager(TaskManager):
         logger.info("Trying to start dump_environment task")
         current_tasks = db().query(Task).filter_by(
             name="dump"
-        )
+        ).all()
         for task in current_tasks:
+            # status is changed by RPC receiver thread
+            refresh(task)
             if task.status == "running":
                 raise errors.DumpRunning()
             elif task.status in ("ready", "error"):
@@ -121,16 +121,25 @@ class DeploymentTask(object):
                 db().add(n)
                 db().commit()
 
+        args = {'task_uuid': task.uuid}
         # here we replace provisioning data if user redefined them
-        serialized_cluster = task.cluster.replaced_deployment_info or \
-            deployment_serializers.serialize(task.cluster)
+        if task.cluster.replaced_deployment_info:
+            args['deployment_info'] = task.cluster.replaced_deployment_info
+        elif settings.COMPACT_DEPLOYMENT_INFO:
+            # common attributes are sent once, orchestrator
+            # merges them into attributes of every node
+            compact_facts = deployment_serializers.serialize(
+                task.cluster, compact=True)
+            args['deployment_info'] = compact_facts['nodes']
+            args['common_attrs'] = compact_facts['common_attrs']
+        else:
+            args['deployment_info'] = deployment_serializers.serialize(
+                task.cluster)
 
         return {
             'method': 'deploy',
             'respond_to': 'deploy_resp',
-            'args': {
-                'task_uuid': task.uuid,
-                'deployment_info': serialized_cluster}}
+            'args': args}
 
     @classmethod
     def execute(cls, task):
@@ -343,6 +352,7 @@ class VerifyNetworksTask(object):
 
     @classmethod
     def _message(cls, task, data):
+        data_by_name = dict((ng['name'], ng) for ng in data)
         nodes = []
         for n in task.cluster.nodes:
             node_json = {'uid': n.id, 'networks': []}
@@ -353,10 +363,7 @@ class VerifyNetworksTask(object):
                     if not ng.cluster_id:
                         vlans.append(0)
                         continue
-                    data_ng = filter(
-                        lambda i: i['name'] == ng.name,
-                        data
-                    )[0]
+                    data_ng = data_by_name[ng.name]
                     if data_ng['vlans']:
                         vlans.extend(data_ng['vlans'])
                     else:
@@ -365,6 +372,8 @@ class VerifyNetworksTask(object):
                         vlans.append(0)
                 if not vlans:
                     continue
+                if settings.COMPACT_VLAN_RANGES:
+                    vlans = NetworkGroup.compress_vlan_ids(vlans)
                 node_json['networks'].append(
                     {'iface': nic.name, 'vlans': vlans}
                 )
@@ -578,7 +587,7 @@ class CheckBeforeDeploymentTask(object):
     def __network_size(cls, network):
         size = 0
         for ip_range in network.ip_ranges:
-            size += len(netaddr.IPRange(ip_range.first, ip_range.last))
+            size += ip_range.last_int - ip_range.first_int + 1
         return size
 
     @classmethod
@@ -286,6 +286,27 @@ class TestHandlers(BaseIntegrationTest):
         self.datadiff(args[1][0], provision_msg)
         self.datadiff(args[1][1], deployment_msg)
 
+    @fake_tasks(fake_rpc=False, mock_rpc=False)
+    @patch('nailgun.rpc.cast')
+    def test_deploy_cast_with_compact_deployment_info(self, mocked_rpc):
+        self.env.create(
+            cluster_kwargs={},
+            nodes_kwargs=[
+                {'roles': ['controller'], 'pending_addition': True},
+                {'roles': ['compute'], 'pending_addition': True}
+            ]
+        )
+
+        with patch.dict(settings.config, {'COMPACT_DEPLOYMENT_INFO': True}):
+            self.env.launch_deployment()
+
+        args, kwargs = nailgun.task.manager.rpc.cast.call_args
+        deployment_args = args[1][1]['args']
+        self.assertEquals(len(deployment_args['deployment_info']), 2)
+        self.assertEquals(len(deployment_args['common_attrs']['nodes']), 2)
+        for node in deployment_args['deployment_info']:
+            self.assertNotIn('nodes', node)
+
     @fake_tasks(fake_rpc=False, mock_rpc=False)
     @patch('nailgun.rpc.cast')
     def test_deploy_and_remove_correct_nodes_and_statuses(self, mocked_rpc):
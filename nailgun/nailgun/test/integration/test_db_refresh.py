@@ -15,15 +15,20 @@
 #    under the License.
 
 from datetime import datetime
+from unittest import skipIf
 from unittest import TestCase
 
+from mock import patch
 from paste.fixture import TestApp
 from sqlalchemy.orm.events import orm
 
 from nailgun.api.models import Node
+from nailgun.db import db
 from nailgun.db import engine
 from nailgun.db import flush
 from nailgun.db import NoCacheQuery
+from nailgun.db import refresh
+from nailgun.settings import settings
 from nailgun.wsgi import build_app
 
 
@@ -42,6 +47,8 @@ class TestDBRefresh(TestCase):
         }
         flush()
 
+    @skipIf(settings.DB_IDENTITY_MAP,
+            "objects are reloaded by refresh() with DB_IDENTITY_MAP")
     def test_session_update(self):
         node = Node()
         node.mac = u"ASDFGHJKLMNOPR"
@@ -59,3 +66,43 @@ class TestDBRefresh(TestCase):
             Node.id == node.id
         ).first()
         self.assertEquals(node.mac, u"12345678")
+
+    @patch.dict(settings.config, {'DB_IDENTITY_MAP': False})
+    def test_refresh_without_identity_map(self):
+        node = Node()
+        node.mac = u"ASDFGHJKLMNOPR"
+        node.timestamp = datetime.now()
+        db().add(node)
+        db().commit()
+        node = db().query(Node).get(node.id)
+
+        with patch.object(db(), 'refresh') as session_refresh:
+            refresh(node)
+        self.assertFalse(session_refresh.called)
+        db.remove()
+
+    @patch.dict(settings.config, {'DB_IDENTITY_MAP': True})
+    def test_identity_map(self):
+        node = Node()
+        node.mac = u"ASDFGHJKLMNOPR"
+        node.timestamp = datetime.now()
+        db().add(node)
+        db().commit()
+        self.assertEquals(db().query(Node).get(node.id).mac, node.mac)
+
+        node2 = self.db2.query(Node).get(node.id)
+        node2.mac = u"12345678"
+        self.db2.commit()
+
+        self.assertEquals(
+            db().query(Node).filter(Node.id == node.id).first().mac,
+            u"ASDFGHJKLMNOPR"
+        )
+        refresh(node)
+        self.assertEquals(node.mac, u"12345678")
+
+        node2.mac = u"87654321"
+        self.db2.commit()
+        refresh()
+        self.assertEquals(db().query(Node).get(node.id).mac, u"87654321")
+        db.remove()
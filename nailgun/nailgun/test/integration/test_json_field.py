@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+
+#    Copyright 2013 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from copy import deepcopy
+
+from mock import patch
+
+from nailgun.api import fields
+from nailgun.api.fields import JSON
+from nailgun.api.fields import TrackedJSON
+from nailgun.api.models import Node
+from nailgun import sqlstats
+from nailgun.test.base import BaseIntegrationTest
+from nailgun.test.base import reverse
+
+
+class TestJSONField(BaseIntegrationTest):
+
+    def get_node(self, node_id):
+        self.db.expire_all()
+        return self.db.query(Node).get(node_id)
+
+    def count_updates(self):
+        with sqlstats.collect() as stats:
+            self.db.commit()
+        return sum(count for statement, count in stats.statements.iteritems()
+                   if statement.startswith('UPDATE'))
+
+    def test_in_place_changes_are_saved(self):
+        node_id = self.env.create_node(api=False).id
+        node = self.get_node(node_id)
+        self.assertIsInstance(node.meta, TrackedJSON)
+
+        node.meta['disks'][0]['size'] = 42
+        self.assertEquals(self.count_updates(), 1)
+        self.assertEquals(
+            self.get_node(node_id).meta['disks'][0]['size'], 42)
+
+        node = self.get_node(node_id)
+        node.meta['interfaces'].append({'name': 'eth42'})
+        node.meta.setdefault('extra', {})['key'] = [1]
+        node.meta['extra']['key'].extend([2, 3])
+        self.assertEquals(self.count_updates(), 1)
+
+        meta = self.get_node(node_id).meta
+        self.assertEquals(meta['disks'][0]['size'], 42)
+        self.assertEquals(meta['interfaces'][-1], {'name': 'eth42'})
+        self.assertEquals(meta['extra'], {'key': [1, 2, 3]})
+
+    def test_unchanged_values_are_not_written(self):
+        node_id = self.env.create_node(api=False).id
+        node = self.get_node(node_id)
+        node.meta = deepcopy(node.meta)
+        node.meta['disks']
+        self.assertEquals(self.count_updates(), 0)
+
+        copy = deepcopy(node.meta)
+        self.assertIs(type(copy), dict)
+        self.assertIs(type(copy['disks']), list)
+        self.assertIs(type(copy['disks'][0]), dict)
+
+    def test_loaded_value_is_not_serialized_again(self):
+        field = JSON()
+        value = field.process_result_value('{"a": [1, {"b": 2}]}', None)
+        with patch.object(fields, 'codec', wraps=fields.codec) as codec:
+            self.assertEquals(field.process_bind_param(value, None),
+                              '{"a": [1, {"b": 2}]}')
+            self.assertEquals(codec.dumps.call_count, 0)
+
+            value['a'][1]['b'] = 3
+            self.assertEquals(field.process_bind_param(value, None),
+                              '{"a": [1, {"b": 3}]}')
+            self.assertEquals(codec.dumps.call_count, 1)
+
+    def test_scalar_value_round_trip(self):
+        cluster = self.env.create_cluster(api=False)
+        resp = self.app.put(
+            reverse('DeploymentInfo', kwargs={'cluster_id': cluster.id}),
+            '"x"',
+            headers=self.default_headers)
+        self.assertEquals(resp.status, 200)
+
+        self.db.expire_all()
+        self.assertEquals(cluster.replaced_deployment_info, 'x')
+
+        cluster.replaced_deployment_info = 42
+        self.db.commit()
+        self.db.expire_all()
+        self.assertEquals(cluster.replaced_deployment_info, 42)
+
+    def test_assigned_value_is_not_copied(self):
+        node_id = self.env.create_node(api=False).id
+        node = self.get_node(node_id)
+        meta = {'disks': []}
+        node.meta = meta
+        self.assertIs(node.meta, meta)
+
+        meta['disks'].append({'size': 42})
+        self.db.commit()
+        self.assertEquals(self.get_node(node_id).meta,
+                          {'disks': [{'size': 42}]})
@@ -14,6 +14,8 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+from datetime import datetime
+from datetime import timedelta
 import time
 
 from nailgun.keepalive.watcher import KeepAliveThread
@@ -58,3 +60,29 @@ class TestKeepalive(BaseIntegrationTest):
         time.sleep(self.watcher.interval + 2)
         self.env.refresh_nodes()
         self.assertEqual(node.online, True)
+
+
+class TestKeepaliveCheck(BaseIntegrationTest):
+
+    def test_expired_nodes_become_offline(self):
+        watcher = KeepAliveThread(interval=2, timeout=60)
+        expired = self.env.create_node(api=False)
+        alive = self.env.create_node(api=False)
+        expired.timestamp = datetime.now() - timedelta(seconds=120)
+        self.db.commit()
+
+        watcher.update_status_nodes()
+        self.env.refresh_nodes()
+        self.assertEqual(expired.online, False)
+        self.assertEqual(alive.online, True)
+
+    def test_nodes_not_offline_during_startup_timeout(self):
+        watcher = KeepAliveThread(interval=2, timeout=60)
+        watcher.started_at = datetime.now()
+        node = self.env.create_node(api=False)
+        node.timestamp = datetime.now() - timedelta(seconds=120)
+        self.db.commit()
+
+        watcher.update_status_nodes()
+        self.env.refresh_nodes()
+        self.assertEqual(node.online, True)
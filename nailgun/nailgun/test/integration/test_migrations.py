@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+#    Copyright 2013 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from alembic import command
+from alembic.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from netaddr import IPAddress
+from sqlalchemy import create_engine
+from sqlalchemy.engine.reflection import Inspector
+
+from nailgun.api.models import Base
+from nailgun.db import db_str
+from nailgun.db import engine
+from nailgun.db import migration_config
+from nailgun.test.base import BaseIntegrationTest
+
+
+class TestMigrations(BaseIntegrationTest):
+
+    schema = 'test_migrations'
+
+    def setUp(self):
+        super(TestMigrations, self).setUp()
+        # migrations are run in separate schema to not wait
+        # for locks held by other sessions on nailgun tables
+        engine.execute('DROP SCHEMA IF EXISTS {0} CASCADE;'
+                       'CREATE SCHEMA {0}'.format(self.schema))
+        url = '{0}?options=-csearch_path%3D{1}'.format(db_str, self.schema)
+        self.engine = create_engine(url)
+        self.config = migration_config(url)
+
+    def tearDown(self):
+        self.engine.dispose()
+        engine.execute('DROP SCHEMA {0} CASCADE'.format(self.schema))
+        super(TestMigrations, self).tearDown()
+
+    def get_revision(self):
+        with self.engine.connect() as con:
+            return MigrationContext.configure(con).get_current_revision()
+
+    def get_indexes(self):
+        inspector = Inspector.from_engine(self.engine)
+        return set(
+            (table, index['name'])
+            for table in inspector.get_table_names()
+            for index in inspector.get_indexes(table)
+            if index['name'].startswith('ix_')
+        )
+
+    def test_migrations_match_models(self):
+        script = ScriptDirectory.from_config(self.config)
+        revisions = list(script.walk_revisions())
+        Base.metadata.create_all(self.engine)
+        command.stamp(self.config, 'head')
+
+        command.downgrade(self.config, revisions[-1].revision)
+        self.assertEquals(self.get_revision(), revisions[-1].revision)
+        self.assertEquals(self.get_indexes(), set())
+        self.assertNotIn('rpc_outbox',
+                         Inspector.from_engine(self.engine).get_table_names())
+
+        command.upgrade(self.config, 'head')
+        self.assertEquals(self.get_revision(), script.get_current_head())
+        self.assertEquals(
+            self.get_indexes(),
+            set(
+                (table.name, index.name)
+                for table in Base.metadata.sorted_tables
+                for index in table.indexes
+            )
+        )
+
+    def test_ip_addresses_are_converted_to_integers(self):
+        Base.metadata.create_all(self.engine)
+        command.stamp(self.config, 'head')
+        command.downgrade(self.config, '1085ed5291d7')
+        self.engine.execute(
+            "INSERT INTO ip_addrs (ip_addr) VALUES ('10.20.0.3')")
+        self.engine.execute(
+            "INSERT INTO ip_addr_ranges (first, last) "
+            "VALUES ('10.20.0.2', '255.255.255.254')")
+
+        command.upgrade(self.config, '8ee2c4c57350')
+        self.assertEquals(
+            self.engine.execute("SELECT ip_addr_int FROM ip_addrs").fetchall(),
+            [(int(IPAddress('10.20.0.3')),)]
+        )
+        self.assertEquals(
+            self.engine.execute(
+                "SELECT first_int, last_int FROM ip_addr_ranges").fetchall(),
+            [(int(IPAddress('10.20.0.2')), 2 ** 32 - 2)]
+        )
@@ -22,6 +22,7 @@ from mock import patch
 from netaddr import IPAddress
 from netaddr import IPNetwork
 from netaddr import IPRange
+from sqlalchemy import event
 from sqlalchemy import not_
 
 import nailgun
@@ -31,6 +32,8 @@ from nailgun.api.models import Network
 from nailgun.api.models import NetworkGroup
 from nailgun.api.models import NodeNICInterface
 from nailgun.api.models import Vlan
+from nailgun.db import engine
+from nailgun.errors import errors
 from nailgun.test.base import BaseIntegrationTest
 from nailgun.test.base import fake_tasks
 from nailgun.test.base import reverse
@@ -129,6 +132,52 @@ class TestNetworkManager(BaseIntegrationTest):
             1
         )
 
+    def test_bulk_assign_ips(self):
+        self.env.create(
+            cluster_kwargs={},
+            nodes_kwargs=[
+                {"pending_addition": True},
+                {"pending_addition": True},
+                {"pending_addition": True}
+            ]
+        )
+        nodes_ids = [n.id for n in self.env.nodes]
+        networks_names = ['management', 'public', 'storage']
+
+        self.env.network_manager.assign_ips(nodes_ids[:1], 'management')
+        self.env.network_manager.bulk_assign_ips(nodes_ids, networks_names)
+        self.env.network_manager.bulk_assign_ips(nodes_ids, networks_names)
+
+        nets = self.db.query(Network).join(NetworkGroup).filter(
+            NetworkGroup.cluster_id == self.env.clusters[0].id
+        ).filter(Network.name.in_(networks_names)).all()
+        self.assertEquals(len(nets), 3)
+        for net in nets:
+            ips = self.db.query(IPAddr).filter_by(network=net.id).all()
+            self.assertEquals(
+                sorted(ip.node for ip in ips),
+                sorted(nodes_ids)
+            )
+            self.assertEquals(
+                len(set(ip.ip_addr for ip in ips)),
+                len(nodes_ids)
+            )
+
+    def test_bulk_assign_admin_ips(self):
+        n1 = self.env.create_node()
+        n2 = self.env.create_node()
+        self.env.network_manager.assign_admin_ips(n1.id, 1)
+        self.env.network_manager.bulk_assign_admin_ips({n1.id: 2, n2.id: 3})
+
+        admin_net_id = self.env.network_manager.get_admin_network_id()
+        admin_ips = self.db.query(IPAddr).filter_by(
+            network=admin_net_id).all()
+        self.assertEquals(
+            len(filter(lambda ip: ip.node == n1.id, admin_ips)), 2)
+        self.assertEquals(
+            len(filter(lambda ip: ip.node == n2.id, admin_ips)), 3)
+        self.assertEquals(len(set(ip.ip_addr for ip in admin_ips)), 5)
+
     def test_get_default_nic_networkgroups(self):
         cluster = self.env.create_cluster(api=True)
         node = self.env.create_node(api=True)
@@ -179,6 +228,27 @@ class TestNetworkManager(BaseIntegrationTest):
         )
         self.assertEquals(vip, vip2)
 
+    def test_assign_vip_skips_ips_outside_ranges(self):
+        cluster = self.env.create_cluster(api=True)
+        network = self.db.query(Network).join(NetworkGroup).filter(
+            NetworkGroup.cluster_id == cluster['id']
+        ).filter_by(name='management').first()
+        self.db.add(IPAddr(ip_addr='1.1.1.1', network=network.id))
+        self.db.commit()
+
+        vip = self.env.network_manager.assign_vip(
+            cluster['id'],
+            "management"
+        )
+        self.assertNotEquals(vip, '1.1.1.1')
+        self.assertTrue(
+            self.env.network_manager.check_ip_belongs_to_net(vip, network)
+        )
+        self.assertFalse(
+            self.env.network_manager.check_ip_belongs_to_net(
+                '1.1.1.1', network)
+        )
+
     def test_get_node_networks_for_vlan_manager(self):
         self.env.create(
             cluster_kwargs={'net_manager': 'VlanManager'},
@@ -195,6 +265,45 @@ class TestNetworkManager(BaseIntegrationTest):
         fixed_nets = filter(lambda net: net['name'] == 'fixed', network_data)
         self.assertEquals(fixed_nets, [])
 
+    def test_get_nodes_networks_query_count_does_not_depend_on_nodes(self):
+        statements = []
+        counting = [False]
+
+        def count_statements(conn, cursor, statement, *args):
+            if counting[0]:
+                statements.append(statement)
+
+        # sqlalchemy 0.7 can't remove engine listeners,
+        # so listener is just disabled after counting
+        event.listen(engine, 'before_cursor_execute', count_statements)
+
+        def get_statements_count(nodes_count):
+            self.env.create(
+                cluster_kwargs={},
+                nodes_kwargs=[{"pending_addition": True}] * nodes_count
+            )
+            cluster = self.env.clusters[-1]
+            nodes_ids = sorted(n.id for n in cluster.nodes)
+            self.env.network_manager.bulk_assign_ips(
+                nodes_ids, ['management', 'public', 'storage'])
+            del statements[:]
+            counting[0] = True
+            try:
+                nodes_networks = self.env.network_manager.\
+                    get_cluster_nodes_networks(cluster.id)
+            finally:
+                counting[0] = False
+            self.assertEquals(sorted(nodes_networks.keys()), nodes_ids)
+            for node_id in nodes_ids:
+                self.assertEquals(
+                    set(n['name'] for n in nodes_networks[node_id]
+                        if 'ip' in n),
+                    set(['management', 'public', 'storage'])
+                )
+            return len(statements)
+
+        self.assertEquals(get_statements_count(1), get_statements_count(4))
+
     def test_nets_empty_list_if_node_does_not_belong_to_cluster(self):
         node = self.env.create_node(api=False)
         network_data = self.env.network_manager.get_node_networks(node.id)
@@ -286,6 +395,34 @@ class TestNetworkManager(BaseIntegrationTest):
         self.assertEquals(len(admin_ips), 1)
         self.assertEquals(admin_ips[0].ip_addr, '10.0.0.1')
 
+    def test_get_free_ips_skips_used_and_gateway(self):
+        map(self.db.delete, self.db.query(IPAddrRange).all())
+        admin_net_id = self.env.network_manager.get_admin_network_id()
+        admin_ng = self.db.query(Network).get(admin_net_id).network_group
+        admin_ng.gateway = '10.0.0.2'
+        self.db.add(IPAddrRange(
+            first='10.0.0.1',
+            last='10.0.0.4',
+            network_group_id=admin_ng.id
+        ))
+        self.db.add(IPAddrRange(
+            first='10.0.1.1',
+            last='10.0.1.2',
+            network_group_id=admin_ng.id
+        ))
+        self.db.add(IPAddr(ip_addr='10.0.0.3', network=admin_net_id))
+        self.db.commit()
+
+        free_ips = self.env.network_manager.get_free_ips(admin_ng.id, 3)
+        self.assertEquals(free_ips, ['10.0.0.1', '10.0.0.4', '10.0.1.1'])
+
+        self.assertRaises(
+            errors.OutOfIPs,
+            self.env.network_manager.get_free_ips,
+            admin_ng.id,
+            5
+        )
+
     def test_vlan_set_null(self):
         self.env.create_cluster(api=True)
         cluster_db = self.env.clusters[0]
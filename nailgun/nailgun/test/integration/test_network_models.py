@@ -187,3 +187,16 @@ class TestNetworkModels(BaseIntegrationTest):
         self.assertEquals(len(nets_db), kw['amount'])
         self.assertEquals(nets_db[0].gateway, "10.0.0.5")
         self.assertEquals(nets_db[1].gateway, "10.0.0.5")
+
+    def test_vlan_ids_compression(self):
+        vlans = [103, 100, 101, 102, 200, 300, 301]
+        ranges = NetworkGroup.compress_vlan_ids(vlans)
+        self.assertEquals(ranges, [[100, 103], [200, 200], [300, 301]])
+        self.assertEquals(
+            NetworkGroup.expand_vlan_ids(ranges),
+            set(vlans)
+        )
+        self.assertEquals(
+            NetworkGroup.expand_vlan_ids([0, [100, 102]]),
+            set([0, 100, 101, 102])
+        )
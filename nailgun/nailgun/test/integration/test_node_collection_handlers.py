@@ -15,9 +15,11 @@
 #    under the License.
 
 import json
+from mock import patch
 
 from nailgun.api.models import Node
 from nailgun.api.models import Notification
+from nailgun.network.manager import NetworkManager
 from nailgun.test.base import BaseIntegrationTest
 from nailgun.test.base import reverse
 
@@ -180,6 +182,129 @@ class TestHandlers(BaseIntegrationTest):
         self.assertNotEquals(node.timestamp, timestamp)
         self.assertEquals('new', node.manufacturer)
 
+    def test_agent_heartbeat(self):
+        node = self.env.create_node(api=False)
+        heartbeat = {'mac': node.mac, 'agent_checksum': 'checksum'}
+
+        resp = self.app.put(
+            reverse('NodeAgentHandler'),
+            json.dumps(heartbeat),
+            headers=self.default_headers,
+            expect_errors=True)
+        # agent data wasn't reported yet
+        self.assertEquals(resp.status, 404)
+
+        resp = self.app.put(
+            reverse('NodeCollectionHandler'),
+            json.dumps([
+                {'mac': node.mac, 'status': 'discover',
+                 'is_agent': True, 'agent_checksum': 'checksum'}
+            ]),
+            headers=self.default_headers)
+        self.assertEquals(resp.status, 200)
+        node = self.db.query(Node).get(node.id)
+        timestamp = node.timestamp
+
+        resp = self.app.put(
+            reverse('NodeAgentHandler'),
+            json.dumps(heartbeat),
+            headers=self.default_headers)
+        self.assertEquals(resp.status, 200)
+        self.assertEquals(json.loads(resp.body), {'id': node.id})
+        node = self.db.query(Node).get(node.id)
+        self.assertNotEquals(node.timestamp, timestamp)
+
+        resp = self.app.put(
+            reverse('NodeAgentHandler'),
+            json.dumps({'mac': node.mac, 'agent_checksum': 'changed'}),
+            headers=self.default_headers,
+            expect_errors=True)
+        self.assertEquals(resp.status, 404)
+
+        node.online = False
+        self.db.commit()
+        resp = self.app.put(
+            reverse('NodeAgentHandler'),
+            json.dumps(heartbeat),
+            headers=self.default_headers,
+            expect_errors=True)
+        # offline node is marked as online by full update
+        self.assertEquals(resp.status, 404)
+
+    def test_agent_heartbeat_after_meta_is_changed(self):
+        node = self.env.create_node(api=False)
+        heartbeat = {'mac': node.mac, 'agent_checksum': 'checksum'}
+        meta = self.env.default_metadata()
+
+        def agent_update():
+            resp = self.app.put(
+                reverse('NodeCollectionHandler'),
+                json.dumps([
+                    {'mac': node.mac, 'is_agent': True,
+                     'agent_checksum': 'checksum'}
+                ]),
+                headers=self.default_headers)
+            self.assertEquals(resp.status, 200)
+
+        def check_heartbeat(status):
+            resp = self.app.put(
+                reverse('NodeAgentHandler'),
+                json.dumps(heartbeat),
+                headers=self.default_headers,
+                expect_errors=True)
+            self.assertEquals(resp.status, status)
+
+        for url, data in (
+            (reverse('NodeHandler', kwargs={'node_id': node.id}),
+             {'meta': meta}),
+            (reverse('NodeCollectionHandler'),
+             [{'id': node.id, 'meta': meta}]),
+        ):
+            agent_update()
+            check_heartbeat(200)
+
+            resp = self.app.put(url, json.dumps(data),
+                                headers=self.default_headers)
+            self.assertEquals(resp.status, 200)
+            # agent has to overwrite changed meta with full update
+            check_heartbeat(404)
+
+    def test_agent_heartbeat_without_checksum(self):
+        node = self.env.create_node(api=False)
+        resp = self.app.put(
+            reverse('NodeAgentHandler'),
+            json.dumps({'mac': node.mac}),
+            headers=self.default_headers,
+            expect_errors=True)
+        self.assertEquals(resp.status, 400)
+
+    def test_unchanged_meta_is_not_processed(self):
+        node = self.env.create_node(api=True)
+        meta = self.env.default_metadata()
+
+        def put_meta(meta):
+            resp = self.app.put(
+                reverse('NodeCollectionHandler'),
+                json.dumps([
+                    {'mac': node['mac'], 'is_agent': True, 'meta': meta}
+                ]),
+                headers=self.default_headers)
+            self.assertEquals(resp.status, 200)
+
+        put_meta(meta)
+        with patch.object(NetworkManager, 'update_interfaces_info') \
+                as update_interfaces:
+            put_meta(meta)
+        self.assertFalse(update_interfaces.called)
+
+        meta['disks'].append(dict(meta['disks'][0], name='sdz'))
+        with patch.object(NetworkManager, 'update_interfaces_info') \
+                as update_interfaces:
+            put_meta(meta)
+        self.assertTrue(update_interfaces.called)
+        node_db = self.db.query(Node).get(node['id'])
+        self.assertEquals(len(node_db.meta['disks']), len(meta['disks']))
+
     def test_node_create_ext_mac(self):
         node1 = self.env.create_node(
             api=False
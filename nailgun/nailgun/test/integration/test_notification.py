@@ -163,3 +163,50 @@ class TestNotification(BaseIntegrationTest):
             notifications[0].message,
             "Cluster deletion fake error"
         )
+
+    def test_buffered_notifications(self):
+        self.env.create(
+            cluster_kwargs={},
+            nodes_kwargs=[{"api": False}, {"api": False}]
+        )
+        cluster = self.env.clusters[0]
+        node1, node2 = self.env.nodes
+        task = Task(name="deploy", cluster_id=cluster.id)
+        self.db.add(task)
+        self.db.commit()
+        notifier.notify("error", "Node %s failed" % node1.id,
+                        node_id=node1.id, task_uuid=task.uuid)
+
+        with notifier.buffered():
+            for node in (node1, node2, node1, node2):
+                notifier.notify(
+                    "error", "Node %s failed" % node.id,
+                    cluster_id=cluster.id,
+                    node_id=node.id,
+                    task_uuid=task.uuid
+                )
+            notifier.notify("done", "Deployed", cluster_id=cluster.id)
+            self.assertEqual(self.db.query(Notification).count(), 1)
+        self.db.commit()
+
+        notifications = self.db.query(Notification).order_by(
+            Notification.id
+        ).all()
+        self.assertEqual(
+            [(n.topic, n.message, n.node_id, n.task_id, n.status)
+             for n in notifications],
+            [("error", "Node %s failed" % node1.id,
+              node1.id, task.id, "unread"),
+             ("error", "Node %s failed" % node2.id,
+              node2.id, task.id, "unread"),
+             ("done", "Deployed", None, None, "unread")]
+        )
+
+    def test_buffered_notifications_discarded_on_error(self):
+        def notify_and_fail():
+            with notifier.buffered():
+                notifier.notify("done", "Deployed")
+                raise ValueError()
+
+        self.assertRaises(ValueError, notify_and_fail)
+        self.assertEqual(self.db.query(Notification).count(), 0)
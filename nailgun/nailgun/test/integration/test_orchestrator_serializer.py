@@ -14,12 +14,14 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+from mock import patch
 
 from nailgun.api.models import Cluster
 from nailgun.api.models import IPAddrRange
 from nailgun.api.models import NetworkGroup
 from nailgun.api.models import Node
 from nailgun.db import db
+from nailgun.network.manager import NetworkManager
 from nailgun.orchestrator.deployment_serializers \
     import OrchestratorHASerializer
 from nailgun.orchestrator.deployment_serializers \
@@ -190,6 +192,28 @@ class TestOrchestratorSerializer(OrchestratorSerializerTestBase):
             self.assertEquals(
                 fact['novanetwork_parameters']['network_size'], 256)
 
+    def test_network_data_computed_once(self):
+        cluster = self.create_env('multinode', 'VlanManager')
+        with patch.object(
+            NetworkManager,
+            'get_nodes_networks',
+            side_effect=NetworkManager().get_nodes_networks
+        ) as get_nodes_networks:
+            facts = self.serializer.serialize(cluster)
+
+        self.assertEquals(get_nodes_networks.call_count, 1)
+        self.assert_roles_flattened(facts)
+
+    def test_serialize_compact(self):
+        compact_facts = self.serializer.serialize_compact(self.cluster)
+
+        self.assert_roles_flattened(compact_facts['nodes'])
+        for node in compact_facts['nodes']:
+            self.assertNotIn('nodes', node)
+        self.assertEquals(
+            self.serializer.merge_facts(compact_facts),
+            self.serializer.serialize(self.cluster))
+
     def test_floatin_ranges_generation(self):
         # Set ip ranges for floating ips
         ranges = [['172.16.0.2', '172.16.0.4'],
@@ -113,6 +113,48 @@ class TestVerifyNetworks(BaseIntegrationTest):
         self.assertEqual(task.message, None)
         self.assertEqual(task.result, error_nodes)
 
+    def test_verify_networks_resp_compact_vlans(self):
+        self.env.create(
+            cluster_kwargs={},
+            nodes_kwargs=[
+                {"api": False},
+                {"api": False}
+            ]
+        )
+        cluster_db = self.env.clusters[0]
+        node1, node2 = self.env.nodes
+        nets_sent = [{'iface': 'eth0', 'vlans': [[100, 104], [200, 201]]}]
+
+        task = Task(
+            name="super",
+            cluster_id=cluster_db.id
+        )
+        task.cache = {
+            "args": {
+                'nodes': [{'uid': node1.id, 'networks': nets_sent},
+                          {'uid': node2.id, 'networks': nets_sent}]
+            }
+        }
+        self.db.add(task)
+        self.db.commit()
+
+        kwargs = {'task_uuid': task.uuid,
+                  'status': 'ready',
+                  'nodes': [{'uid': node1.id, 'networks': [
+                             {'iface': 'eth0',
+                              'vlans': range(100, 105) + [200, 201]}]},
+                            {'uid': node2.id, 'networks': [
+                             {'iface': 'eth0',
+                              'vlans': [[100, 103], [201, 201]]}]}]}
+        self.receiver.verify_networks_resp(**kwargs)
+        self.db.refresh(task)
+        self.assertEqual(task.status, "error")
+        self.assertEqual(task.result, [
+            {'uid': node2.id, 'interface': 'eth0',
+             'name': node2.name, 'absent_vlans': [104, 200],
+             'mac': node2.interfaces[0].mac}
+        ])
+
     def test_verify_networks_resp_error_with_removed_node(self):
         self.env.create(
             cluster_kwargs={},
@@ -628,6 +670,110 @@ class TestConsumer(BaseIntegrationTest):
         self.db.refresh(self.env.nodes[0])
         self.assertEqual(self.env.nodes[0].progress, 100)
 
+    def test_deploy_resp_nodes_progress(self):
+        self.env.create(
+            cluster_kwargs={},
+            nodes_kwargs=[
+                {"api": False, "status": "provisioned"},
+                {"api": False, "status": "provisioned"},
+                {"api": False, "status": "provisioned"}
+            ]
+        )
+        task = Task(
+            uuid=str(uuid.uuid4()),
+            name="deployment",
+            status="running",
+            cluster_id=self.env.clusters[0].id
+        )
+        self.db.add(task)
+        self.db.commit()
+        node1, node2, node3 = self.env.nodes
+
+        self.receiver.deploy_resp(
+            task_uuid=task.uuid,
+            nodes=[{'uid': node1.id, 'status': 'deploying', 'progress': 50},
+                   {'uid': node2.id, 'status': 'deploying', 'progress': 20}]
+        )
+        self.db.refresh(task)
+        # (30 + 35) + (30 + 14) + 0 = 109
+        self.assertEqual(task.progress, 36)
+
+        with patch.object(rcvr.NodesProgress, 'node_progress',
+                          wraps=rcvr.NodesProgress().node_progress) as calc:
+            self.receiver.deploy_resp(
+                task_uuid=task.uuid,
+                nodes=[{'uid': node2.id, 'status': 'deploying',
+                        'progress': 100}]
+            )
+        # only changed node is recalculated
+        self.assertEqual(calc.call_count, 1)
+        self.db.refresh(task)
+        # (30 + 35) + (30 + 70) + 0 = 165
+        self.assertEqual(task.progress, 55)
+
+        # node updated outside of deploy_resp is recalculated
+        node3.status = 'deploying'
+        node3.progress = 50
+        self.db.commit()
+        self.receiver.deploy_resp(
+            task_uuid=task.uuid,
+            nodes=[{'uid': node1.id, 'status': 'deploying', 'progress': 50}]
+        )
+        self.db.refresh(task)
+        # (30 + 35) + (30 + 70) + (30 + 35) = 230
+        self.assertEqual(task.progress, 76)
+
+        # node marked offline by keepalive watcher counts as done
+        node3.online = False
+        self.db.commit()
+        self.receiver.deploy_resp(
+            task_uuid=task.uuid,
+            nodes=[{'uid': node1.id, 'status': 'deploying', 'progress': 50}]
+        )
+        self.db.refresh(task)
+        # (30 + 35) + (30 + 70) + 100 = 265
+        self.assertEqual(task.progress, 88)
+
+    def test_deploy_resp_nodes_progress_eviction(self):
+        self.env.create(
+            cluster_kwargs={},
+            nodes_kwargs=[{"api": False, "status": "provisioned"}]
+        )
+        tasks = []
+        for _ in xrange(2):
+            task = Task(
+                uuid=str(uuid.uuid4()),
+                name="deployment",
+                status="running",
+                cluster_id=self.env.clusters[0].id
+            )
+            self.db.add(task)
+            tasks.append(task)
+        self.db.commit()
+        stopped, running = tasks
+        node = self.env.nodes[0]
+
+        self.receiver.deploy_resp(
+            task_uuid=stopped.uuid,
+            nodes=[{'uid': node.id, 'status': 'deploying', 'progress': 10}]
+        )
+        self.assertIn(stopped.uuid, self.receiver._nodes_progress)
+
+        # task is stopped without final message
+        stopped.status = "error"
+        self.db.commit()
+        self.receiver.deploy_resp(
+            task_uuid=running.uuid,
+            nodes=[{'uid': node.id, 'status': 'deploying', 'progress': 20}]
+        )
+        self.assertNotIn(stopped.uuid, self.receiver._nodes_progress)
+        self.assertIn(running.uuid, self.receiver._nodes_progress)
+
+        self.db.delete(running)
+        self.db.commit()
+        self.receiver.deploy_resp(task_uuid=running.uuid, nodes=[])
+        self.assertNotIn(running.uuid, self.receiver._nodes_progress)
+
     def test_remove_nodes_resp(self):
         self.env.create(
             cluster_kwargs={},
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+
+#    Copyright 2013 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from kombu import Connection
+from mock import patch
+
+from nailgun.api.models import RPCOutboxMessage
+from nailgun import rpc
+from nailgun.rpc.threaded import RPCPublisherThread
+from nailgun.settings import settings
+from nailgun.test.base import BaseIntegrationTest
+
+
+class TestRPCPublisher(BaseIntegrationTest):
+
+    def setUp(self):
+        super(TestRPCPublisher, self).setUp()
+        rpc.reset_connection()
+        self.patchers = [
+            patch.object(rpc, 'conn_str', 'memory://'),
+            patch.dict(settings.config, {'RPC_OUTBOX': True})
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+
+    def tearDown(self):
+        for patcher in self.patchers:
+            patcher.stop()
+        rpc.reset_connection()
+        super(TestRPCPublisher, self).tearDown()
+
+    def get_messages(self):
+        messages = []
+        with Connection('memory://') as conn:
+            queue = rpc.naily_queue(conn.default_channel)
+            while True:
+                message = queue.get(no_ack=True)
+                if message is None:
+                    break
+                messages.append(message.payload)
+        return messages
+
+    def test_cast_stores_message_in_outbox(self):
+        rpc.cast('naily', {'method': 'deploy'})
+        self.db.commit()
+
+        messages = self.db.query(RPCOutboxMessage).all()
+        self.assertEquals(len(messages), 1)
+        self.assertEquals(messages[0].routing_key, 'naily')
+        self.assertEquals(messages[0].message, {'method': 'deploy'})
+        self.assertEquals(self.get_messages(), [])
+
+    def test_publisher_is_signalled_after_commit(self):
+        rpc.outbox_ready.clear()
+        rpc.cast('naily', {'method': 'deploy'})
+        self.assertFalse(rpc.outbox_ready.is_set())
+        self.db.commit()
+        self.assertTrue(rpc.outbox_ready.is_set())
+
+        rpc.outbox_ready.clear()
+        rpc.cast('naily', {'method': 'deploy'})
+        self.db.rollback()
+        self.db.commit()
+        self.assertFalse(rpc.outbox_ready.is_set())
+
+    def test_publish_batch(self):
+        for method in ('provision', 'deploy', 'verify_networks'):
+            rpc.cast('naily', {'method': method})
+        self.db.commit()
+
+        publisher = RPCPublisherThread(batch_size=2)
+        self.assertEquals(publisher.publish_batch(), 2)
+        self.assertEquals(publisher.publish_batch(), 1)
+        self.assertEquals(publisher.publish_batch(), 0)
+
+        self.assertEquals(self.db.query(RPCOutboxMessage).count(), 0)
+        self.assertEquals(
+            self.get_messages(),
+            [{'method': 'provision'},
+             {'method': 'deploy'},
+             {'method': 'verify_networks'}]
+        )
+
+    def test_failed_message_stays_in_outbox(self):
+        for method in ('provision', 'deploy'):
+            rpc.cast('naily', {'method': method})
+        self.db.commit()
+
+        publish = rpc.publish
+
+        def fail_on_deploy(name, message, producer=None):
+            if message['method'] == 'deploy':
+                raise IOError()
+            publish(name, message, producer)
+
+        publisher = RPCPublisherThread()
+        with patch.object(rpc, 'publish', side_effect=fail_on_deploy):
+            self.assertRaises(IOError, publisher.publish_batch)
+
+        messages = self.db.query(RPCOutboxMessage).all()
+        self.assertEquals(len(messages), 1)
+        self.assertEquals(messages[0].message, {'method': 'deploy'})
+        self.assertEquals(self.get_messages(), [{'method': 'provision'}])
+
+    def test_thread_publishes_outbox_on_join(self):
+        rpc.cast('naily', {'method': 'deploy'})
+        self.db.commit()
+
+        publisher = RPCPublisherThread(interval=0.01)
+        publisher.start()
+        publisher.join()
+
+        self.assertEquals(self.get_messages(), [{'method': 'deploy'}])
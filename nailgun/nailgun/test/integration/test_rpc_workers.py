@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+
+#    Copyright 2013 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from collections import defaultdict
+import threading
+import time
+from unittest import TestCase
+import uuid
+
+from kombu import Connection
+from mock import Mock
+from mock import patch
+
+from nailgun.api.models import Task
+from nailgun import rpc
+from nailgun.rpc.threaded import coalesce_msgs
+from nailgun.rpc.threaded import RPCConsumer
+from nailgun.rpc.threaded import RPCKombuThread
+from nailgun.test.base import BaseIntegrationTest
+
+
+class FakeReceiver(object):
+
+    lock = threading.Lock()
+    received = defaultdict(list)
+    threads = defaultdict(set)
+
+    @classmethod
+    def deploy_resp(cls, **kwargs):
+        with cls.lock:
+            cls.received[kwargs['task_uuid']].append(kwargs['progress'])
+            cls.threads[kwargs['task_uuid']].add(
+                threading.current_thread().ident
+            )
+
+    @classmethod
+    def reset(cls):
+        cls.received.clear()
+        cls.threads.clear()
+
+
+class TestRPCWorkers(BaseIntegrationTest):
+
+    def setUp(self):
+        super(TestRPCWorkers, self).setUp()
+        FakeReceiver.reset()
+
+    def deploy_resp(self, task_uuid, progress):
+        return {
+            'method': 'deploy_resp',
+            'args': {'task_uuid': task_uuid, 'progress': progress}
+        }
+
+    def test_messages_of_task_are_processed_in_order(self):
+        consumer = RPCConsumer(None, FakeReceiver, workers=3, queue_size=2)
+        msg = Mock()
+        for progress in xrange(50):
+            for task_uuid in ('first', 'second', 'third', 'fourth'):
+                consumer.consume_msg(
+                    self.deploy_resp(task_uuid, progress), msg
+                )
+        consumer.stop_workers()
+
+        self.assertEquals(msg.ack.call_count, 200)
+        for task_uuid in ('first', 'second', 'third', 'fourth'):
+            received = FakeReceiver.received[task_uuid]
+            # superseded progress messages can be dropped
+            self.assertEquals(received, sorted(received))
+            self.assertEquals(received[-1], 49)
+            self.assertEquals(len(FakeReceiver.threads[task_uuid]), 1)
+
+    def test_messages_are_acked_after_processing(self):
+        processed = threading.Event()
+        release = threading.Event()
+
+        class BlockingReceiver(object):
+            @classmethod
+            def deploy_resp(cls, **kwargs):
+                release.wait(5)
+                processed.set()
+
+        consumer = RPCConsumer(None, BlockingReceiver, workers=2)
+        msg = Mock()
+        msg.ack.side_effect = lambda: self.assertTrue(processed.is_set())
+        consumer.consume_msg(self.deploy_resp('first', 1), msg)
+        consumer.on_iteration()
+        self.assertEquals(msg.ack.call_count, 0)
+
+        release.set()
+        processed.wait(5)
+        consumer.stop_workers()
+        self.assertEquals(msg.ack.call_count, 1)
+
+    def test_messages_of_cluster_are_processed_by_one_worker(self):
+        cluster = self.env.create_cluster(api=False)
+        tasks = [
+            Task(uuid=str(uuid.uuid4()), name=name, cluster_id=cluster.id)
+            for name in ('deploy', 'provision', 'deployment')
+        ]
+        self.db.add_all(tasks)
+        self.db.commit()
+
+        consumer = RPCConsumer(None, FakeReceiver, workers=8)
+        workers = set(
+            consumer.get_worker(self.deploy_resp(task.uuid, 0))
+            for task in tasks
+        )
+        consumer.stop_workers()
+        self.assertEquals(len(workers), 1)
+
+    def test_messages_of_old_channel_are_not_acked(self):
+        consumer = RPCConsumer(None, FakeReceiver, workers=2)
+        old_msg = Mock()
+        consumer.consume_msg(self.deploy_resp('first', 1), old_msg)
+        consumer.on_connection_revived()
+        msg = Mock()
+        consumer.consume_msg(self.deploy_resp('first', 2), msg)
+        consumer.stop_workers()
+
+        self.assertEquals(FakeReceiver.received['first'][-1], 2)
+        self.assertFalse(old_msg.ack.called)
+        self.assertEquals(msg.ack.call_count, 1)
+
+    def test_unknown_method_does_not_stop_worker(self):
+        consumer = RPCConsumer(None, FakeReceiver, workers=2)
+        msg = Mock()
+        consumer.consume_msg({'method': 'unknown', 'args': {}}, msg)
+        consumer.consume_msg(self.deploy_resp('first', 1), msg)
+        consumer.stop_workers()
+
+        self.assertEquals(FakeReceiver.received['first'], [1])
+
+    def test_single_worker_processes_messages_inline(self):
+        consumer = RPCConsumer(None, FakeReceiver, workers=1)
+        self.assertEquals(consumer.workers, [])
+        msg = Mock()
+        msg.ack.side_effect = lambda: self.assertEquals(
+            FakeReceiver.received['first'], [2])
+        for progress in (1, 2):
+            consumer.consume_msg(self.deploy_resp('first', progress), msg)
+        consumer.consume_msg({'method': 'unknown', 'args': {}}, msg)
+        self.assertEquals(msg.ack.call_count, 0)
+
+        # superseded progress message is dropped, all are acked
+        consumer.on_iteration()
+        self.assertEquals(msg.ack.call_count, 3)
+        self.assertEquals(FakeReceiver.threads['first'],
+                          set([threading.current_thread().ident]))
+
+    def check_thread_drains_queue_on_join(self, workers):
+        with patch.object(rpc, 'conn_str', 'memory://'):
+            with Connection('memory://') as conn:
+                with conn.Producer(serializer='json') as producer:
+                    for progress in xrange(10):
+                        producer.publish(
+                            self.deploy_resp('first', progress),
+                            exchange=rpc.nailgun_exchange,
+                            routing_key='nailgun',
+                            declare=[rpc.nailgun_queue]
+                        )
+
+            with patch.dict(rpc.settings.config,
+                            {'RPC_CONSUMER_WORKERS': workers}):
+                thread = RPCKombuThread(rcvr_class=FakeReceiver)
+                thread.start()
+                for _ in xrange(50):
+                    if 9 in FakeReceiver.received['first']:
+                        break
+                    time.sleep(0.1)
+                thread.join()
+
+        self.assertEquals(FakeReceiver.received['first'][-1], 9)
+
+    def test_thread_drains_queue_on_join(self):
+        self.check_thread_drains_queue_on_join(workers=2)
+
+    def test_single_consumer_thread_drains_queue_on_join(self):
+        self.check_thread_drains_queue_on_join(workers=1)
+        # delivered messages are coalesced
+        self.assertLess(len(FakeReceiver.received['first']), 10)
+
+
+class TestCoalesceMessages(TestCase):
+
+    def deploy_resp(self, task_uuid, nodes, **kwargs):
+        kwargs.update({'task_uuid': task_uuid, 'nodes': nodes})
+        return {'method': 'deploy_resp', 'args': kwargs}
+
+    def test_progress_messages_are_coalesced(self):
+        msgs = [
+            self.deploy_resp('1', [{'uid': 1, 'progress': 10}]),
+            self.deploy_resp('2', [{'uid': 1, 'progress': 10}]),
+            self.deploy_resp('1', [{'uid': 1, 'progress': 20}]),
+            self.deploy_resp('1', [{'uid': 1, 'progress': 30}]),
+            self.deploy_resp('1', [{'uid': 2, 'progress': 30}]),
+        ]
+        self.assertEquals(
+            coalesce_msgs(msgs),
+            [msgs[1], msgs[3], msgs[4]]
+        )
+
+    def test_status_changes_are_not_coalesced(self):
+        msgs = [
+            self.deploy_resp(
+                '1', [{'uid': 1, 'progress': 0, 'status': 'provisioned'}]),
+            self.deploy_resp(
+                '1', [{'uid': 1, 'progress': 10, 'status': 'deploying'}]),
+            self.deploy_resp(
+                '1', [{'uid': 1, 'progress': 100, 'status': 'error',
+                       'error_type': 'deploy'}]),
+            self.deploy_resp(
+                '1', [{'uid': 1, 'progress': 100, 'status': 'error',
+                       'error_type': 'deploy'}]),
+            self.deploy_resp('1', [], status='ready', progress=100),
+            self.deploy_resp('1', [], status='ready', progress=100),
+        ]
+        self.assertEquals(coalesce_msgs(msgs), msgs)
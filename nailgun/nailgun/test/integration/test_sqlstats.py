@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+#    Copyright 2013 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import logging
+import tempfile
+
+from mock import Mock
+from mock import patch
+from paste.fixture import TestApp
+
+from nailgun.api.models import Node
+from nailgun.logger import api_logger
+from nailgun.logger import HTTPLoggerMiddleware
+from nailgun.settings import settings
+from nailgun import sqlstats
+from nailgun.test.base import BaseIntegrationTest
+from nailgun.test.base import reverse
+from nailgun.wsgi import build_app
+
+
+class TestSQLStats(BaseIntegrationTest):
+
+    def test_repeated_statements_are_detected(self):
+        ids = [self.env.create_node(api=False).id for _ in xrange(3)]
+
+        with sqlstats.collect() as stats:
+            for node_id in ids:
+                self.db.query(Node.mac).filter_by(id=node_id).first()
+            for n in xrange(1, 3):
+                self.db.query(Node.mac).filter(Node.id.in_(ids[:n])).all()
+        self.assertEquals(stats.count, 5)
+        self.assertEquals(len(stats.statements), 3)
+        repeated = stats.repeated(threshold=2)
+        self.assertEquals([count for shape, count in repeated], [3, 2])
+        self.assertIn('IN (...)', repeated[1][0])
+
+        log = Mock()
+        with patch.dict(settings.config, {'SQL_STATS_REPEAT_THRESHOLD': 3}):
+            stats.warn_repeated(log, 'test')
+        self.assertEquals(log.warning.call_count, 1)
+
+        with patch.dict(settings.config, {'SQL_STATS': False}):
+            with sqlstats.collect() as stats:
+                self.assertIsNone(stats)
+
+    def test_stats_in_response(self):
+        self.env.create_node(api=False)
+        log_file = tempfile.NamedTemporaryFile()
+        with patch.dict(settings.config, {'API_LOG': log_file.name,
+                                          'SQL_STATS_HEADERS': True}):
+            middleware = HTTPLoggerMiddleware(build_app().wsgifunc())
+            try:
+                url = reverse('NodeCollectionHandler')
+                resp = TestApp(middleware).get(
+                    url,
+                    extra_environ={'REQUEST_URI': url,
+                                   'REMOTE_PORT': '1234'}
+                )
+            finally:
+                for handler in api_logger.handlers[:]:
+                    if isinstance(handler, logging.FileHandler):
+                        api_logger.removeHandler(handler)
+        self.assertEquals(200, resp.status)
+        self.assertGreater(int(resp.header('X-SQL-Count')), 0)
+        self.assertIn('SQL statements in', log_file.read())
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+
+#    Copyright 2013 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from mock import patch
+
+from nailgun.api.models import Task
+from nailgun.task.helpers import TaskHelper
+from nailgun.test.base import BaseIntegrationTest
+
+
+class TestTaskHelpers(BaseIntegrationTest):
+
+    def create_supertask(self):
+        self.env.create(cluster_kwargs={}, nodes_kwargs=[])
+        cluster = self.env.clusters[0]
+        supertask = Task(name='deploy', cluster=cluster, status='running')
+        self.db.add(supertask)
+        self.db.commit()
+        provision = supertask.create_subtask('provision')
+        deployment = supertask.create_subtask('deployment')
+        provision.weight = 0.4
+        deployment.weight = 0.6
+        self.db.commit()
+        return supertask, provision, deployment
+
+    def test_update_task_status_updates_parent_with_one_commit(self):
+        supertask, provision, deployment = self.create_supertask()
+
+        with patch.object(self.db, 'commit',
+                          wraps=self.db.commit) as commit:
+            TaskHelper.update_task_status(provision.uuid, 'running', 50)
+        self.assertEquals(commit.call_count, 1)
+
+        self.db.refresh(supertask)
+        self.assertEquals(supertask.status, 'running')
+        # 0.4 * 50 + 0.6 * 0
+        self.assertEquals(supertask.progress, 20)
+
+    def test_update_task_status_finishes_parent_and_cluster(self):
+        supertask, provision, deployment = self.create_supertask()
+
+        TaskHelper.update_task_status(provision.uuid, 'ready', 100)
+        TaskHelper.update_task_status(deployment.uuid, 'error', 100,
+                                      'Deployment failed')
+
+        self.db.refresh(supertask)
+        self.assertEquals(supertask.status, 'error')
+        self.assertEquals(supertask.progress, 100)
+        self.assertEquals(supertask.message, 'Deployment failed')
+        self.assertEquals(supertask.cluster.status, 'error')
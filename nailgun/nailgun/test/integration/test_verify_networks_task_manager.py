@@ -17,6 +17,7 @@
 import json
 from mock import patch
 
+from nailgun.settings import settings
 from nailgun.test.base import BaseIntegrationTest
 from nailgun.test.base import fake_tasks
 from nailgun.test.base import reverse
@@ -102,3 +103,26 @@ class TestVerifyNetworkTaskManagers(BaseIntegrationTest):
             )
         )
         self.assertEquals(mocked_rpc.called, False)
+
+    @fake_tasks(fake_rpc=False)
+    def test_network_verify_compact_vlan_ranges(self, mocked_rpc, macs_mock):
+        macs_mock.return_value = self.master_macs
+
+        with patch.dict(settings.config, {'COMPACT_VLAN_RANGES': True}):
+            self.env.launch_verify_networks()
+
+        message = mocked_rpc.call_args[0][1]
+        for node in message['args']['nodes']:
+            for network in node['networks']:
+                self.assertTrue(network['vlans'])
+                for vlan_range in network['vlans']:
+                    self.assertEquals(len(vlan_range), 2)
+                    self.assertLessEqual(vlan_range[0], vlan_range[1])
+
+    @fake_tasks()
+    def test_network_verify_with_compact_vlan_ranges(self, macs_mock):
+        macs_mock.return_value = self.master_macs
+
+        with patch.dict(settings.config, {'COMPACT_VLAN_RANGES': True}):
+            task = self.env.launch_verify_networks()
+        self.env.wait_ready(task, 30)
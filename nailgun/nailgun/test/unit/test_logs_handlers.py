@@ -28,6 +28,9 @@ from mock import Mock
 from mock import patch
 
 import nailgun
+from nailgun.api.handlers import logs
+from nailgun.api.handlers.logs import LogIndex
+from nailgun.api.handlers.logs import LogParser
 from nailgun.api.handlers.logs import read_backwards
 from nailgun.api.models import RedHatAccount
 from nailgun.errors import errors
@@ -179,6 +182,142 @@ class TestLogs(BaseIntegrationTest):
         self.assertEquals(response['entries'], log_entries)
         settings.LOGS[0]['multiline'] = False
 
+    def test_log_entries_by_date(self):
+        log_entries = [
+            [
+                '2013-10-0{0} 10:00:00'.format(day),
+                'LEVEL{0}'.format(day),
+                'text{0}'.format(day),
+            ] for day in xrange(1, 10)
+        ]
+        self.env.create_cluster(api=False)
+        self._create_logfile_for_node(settings.LOGS[0], log_entries)
+
+        with patch.object(LogIndex, 'step', 20):
+            resp = self.app.get(
+                reverse('LogEntryCollectionHandler'),
+                params={'source': settings.LOGS[0]['id'],
+                        'date_after': '2013-10-03 10:00:00',
+                        'date_before': '2013-10-06 12:00:00'},
+                headers=self.default_headers
+            )
+        self.assertEquals(200, resp.status)
+        response = json.loads(resp.body)
+        response['entries'].reverse()
+        self.assertEquals(response['entries'], log_entries[2:6])
+
+        index = LogIndex.get(self.local_log_file, None)
+        self.assertEquals(len(index.samples), len(log_entries))
+        self.assertEquals(
+            index.offset_after((2013, 10, 6, 12, 0, 0)),
+            sum(len(':'.join(e)) + 1 for e in log_entries[:6])
+        )
+
+    def test_log_entries_before_first_entry(self):
+        log_entries = [
+            [
+                '2013-10-0{0} 10:00:00'.format(day),
+                'LEVEL{0}'.format(day),
+                'text{0}'.format(day),
+            ] for day in xrange(1, 10)
+        ]
+        self.env.create_cluster(api=False)
+        self._create_logfile_for_node(settings.LOGS[0], log_entries)
+
+        positions = []
+
+        def reader(f, *args, **kwargs):
+            positions.append(f.tell())
+            return read_backwards(f, *args, **kwargs)
+
+        with patch.object(LogIndex, 'step', 20):
+            with patch.object(logs, 'read_backwards', reader):
+                resp = self.app.get(
+                    reverse('LogEntryCollectionHandler'),
+                    params={'source': settings.LOGS[0]['id'],
+                            'date_before': '2013-09-30 10:00:00'},
+                    headers=self.default_headers
+                )
+        self.assertEquals(200, resp.status)
+        self.assertEquals(json.loads(resp.body)['entries'], [])
+        # file is read backwards from the first entry
+        self.assertEquals(positions, [0])
+
+    def test_log_index_is_updated_incrementally(self):
+        parse_date = Mock(side_effect=lambda line: tuple(map(int, line)))
+        with open(self.local_log_file, 'w') as f:
+            f.write('1\n2\n3')
+        index = LogIndex(self.local_log_file, parse_date, step=1)
+        index.update()
+        self.assertEquals(index.samples, [((1,), 0), ((2,), 2)])
+
+        with open(self.local_log_file, 'a') as f:
+            f.write('\n4\n')
+        index.update()
+        self.assertEquals(
+            index.samples,
+            [((1,), 0), ((2,), 2), ((3,), 4), ((4,), 6)]
+        )
+        self.assertEquals(parse_date.call_count, 4)
+
+    def test_log_index_reads_only_sampled_lines(self):
+        parse_date = Mock(side_effect=lambda line: (int(line),))
+        with open(self.local_log_file, 'w') as f:
+            f.write(''.join('%d\n' % i for i in xrange(10, 40)))
+        index = LogIndex(self.local_log_file, parse_date, step=10)
+        index.update()
+        self.assertEquals(
+            index.samples,
+            [((10,), 0), ((14,), 12), ((18,), 24), ((22,), 36),
+             ((26,), 48), ((30,), 60), ((34,), 72), ((38,), 84)]
+        )
+        self.assertEquals(parse_date.call_count, 8)
+
+    def test_log_index_detects_copytruncate(self):
+        parse_date = Mock(side_effect=lambda line: tuple(map(int, line)))
+        with open(self.local_log_file, 'w') as f:
+            f.write('1\n2\n')
+        index = LogIndex(self.local_log_file, parse_date, step=1)
+        index.update()
+
+        # file is truncated in place and grows past its old size
+        with open(self.local_log_file, 'r+') as f:
+            f.truncate(0)
+            f.write('5\n6\n7\n')
+        index.update()
+        self.assertEquals(index.samples, [((5,), 0), ((6,), 2), ((7,), 4)])
+
+    def test_log_parser(self):
+        log_config = dict(settings.LOGS[0], date_format='%Y-%m-%dT%H:%M:%S')
+        parser = LogParser.get(log_config)
+        self.assertIs(parser, LogParser.get(dict(log_config)))
+        self.assertEquals(parser.parse_date('2013-10-06T12:05:09'),
+                          (2013, 10, 6, 12, 5, 9))
+        for date in ('2013-10-06 12:05:09', '2013-13-06T12:05:09'):
+            self.assertRaises(ValueError, parser.parse_date, date)
+        self.assertEquals(
+            LogParser.format_date((2013, 10, 6, 12, 5, 9),
+                                  '%d.%m.%Y %H:%M:%S'),
+            '06.10.2013 12:05:09'
+        )
+        self.assertEquals(
+            LogParser.format_date((2013, 10, 6, 12, 5, 9), '%b %d'),
+            'Oct 06'
+        )
+
+        fallback = LogParser.get(dict(log_config, date_format='%b %d %Y'))
+        self.assertIsNone(fallback.date_regexp)
+        self.assertEquals(fallback.parse_date('Oct 06 2013'),
+                          (2013, 10, 6, 0, 0, 0))
+
+        mask = LogParser.get_masking([
+            RedHatAccount(username='user.name', password='pass+'),
+            RedHatAccount(username='other', password='')
+        ])
+        self.assertEquals(mask('user.name pass+ userXname other'),
+                          'username password userXname username')
+        self.assertIsNone(LogParser.get_masking([]))
+
     def test_backward_reader(self):
         f = tempfile.TemporaryFile(mode='r+')
         forward_lines = []
@@ -224,6 +363,37 @@ class TestLogs(BaseIntegrationTest):
 
         f.close()
 
+    def test_backward_reader_growing_file(self):
+        lines = ['first\n', 'x' * 1024 * 1024 + '\n', 'last']
+        with open(self.local_log_file, 'w') as f:
+            f.write(''.join(lines))
+
+        with open(self.local_log_file, 'r') as f:
+            f.seek(0, os.SEEK_END)
+            reader = read_backwards(f)
+            self.assertEquals(next(reader), 'last')
+            with open(self.local_log_file, 'a') as w:
+                w.write(' appended\n')
+            self.assertEquals(list(reader), lines[1::-1])
+
+        f = StringIO(''.join(lines))
+        f.seek(len(lines[0]))
+        self.assertEquals(list(read_backwards(f)), lines[:1])
+
+    def test_backward_reader_truncated_file(self):
+        lines = ['first\n', 'x' * 1024 * 1024 + '\n', 'last\n']
+        with open(self.local_log_file, 'w') as f:
+            f.write(''.join(lines))
+
+        with open(self.local_log_file, 'r') as f:
+            f.seek(0, os.SEEK_END)
+            reader = read_backwards(f)
+            self.assertEquals(next(reader), 'last\n')
+            # copytruncate by logrotate
+            with open(self.local_log_file, 'r+') as w:
+                w.truncate(0)
+            self.assertEquals(list(reader), [])
+
     def _create_logfile_for_node(self, log_config, log_entries, node=None):
         if log_config['remote']:
             log_dir = os.path.join(self.log_dir, node.ip)
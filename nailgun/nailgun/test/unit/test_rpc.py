@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+
+#    Copyright 2013 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from kombu import Connection
+from mock import patch
+from unittest import TestCase
+
+from nailgun import rpc
+from nailgun.settings import settings
+
+
+class TestRPCCast(TestCase):
+
+    def setUp(self):
+        rpc.reset_connection()
+        self.conn_patcher = patch.object(rpc, 'conn_str', 'memory://')
+        self.conn_patcher.start()
+        self.settings_patcher = patch.dict(
+            settings.config, {'RPC_OUTBOX': False})
+        self.settings_patcher.start()
+
+    def tearDown(self):
+        rpc.reset_connection()
+        self.conn_patcher.stop()
+        self.settings_patcher.stop()
+
+    def get_messages(self):
+        messages = []
+        with Connection('memory://') as conn:
+            queue = rpc.naily_queue(conn.default_channel)
+            while True:
+                message = queue.get(no_ack=True)
+                if message is None:
+                    break
+                messages.append(message.payload)
+        return messages
+
+    def test_cast_reuses_connection(self):
+        rpc.cast('naily', {'method': 'first'})
+        connection = rpc.get_connection()
+        rpc.cast('naily', {'method': 'second'})
+        self.assertIs(rpc.get_connection(), connection)
+        self.assertEquals(
+            self.get_messages(),
+            [{'method': 'first'}, {'method': 'second'}]
+        )
+
+    def test_message_is_not_dumped_without_debug(self):
+        with patch.object(rpc.LazyDump, '__str__') as dump:
+            with patch.object(rpc.logger, 'isEnabledFor', return_value=False):
+                rpc.cast('naily', {'method': 'first'})
+        self.assertFalse(dump.called)
+        self.get_messages()
@@ -20,6 +20,8 @@ import web
 from web.httpserver import StaticMiddleware
 from web.httpserver import WSGIServer
 
+from nailgun.notifier import buffer_notifications
+
 curdir = os.path.dirname(__file__)
 sys.path.insert(0, curdir)
 
@@ -35,6 +37,7 @@ from nailgun.urls import urls
 def build_app():
     app = web.application(urls, locals())
     app.add_processor(load_db_driver)
+    app.add_processor(buffer_notifications)
     app.add_processor(forbid_client_caching)
     return app
 
@@ -95,6 +98,10 @@ def appstart(keepalive=False):
         rpc_process = threaded.RPCKombuThread()
         logger.info("Running RPC consumer...")
         rpc_process.start()
+        if settings.RPC_OUTBOX:
+            rpc_publisher = threaded.RPCPublisherThread()
+            logger.info("Running RPC publisher...")
+            rpc_publisher.start()
     logger.info("Running WSGI app...")
 
     wsgifunc = build_middleware(app.wsgifunc)
@@ -109,4 +116,7 @@ def appstart(keepalive=False):
     if not settings.FAKE_TASKS:
         logger.info("Stopping RPC consumer...")
         rpc_process.join()
+        if settings.RPC_OUTBOX:
+            logger.info("Stopping RPC publisher...")
+            rpc_publisher.join()
     logger.info("Done")
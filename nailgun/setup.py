@@ -25,6 +25,7 @@ requires = [
     'Paste==1.7.5.1',
     'PyYAML==3.10',
     'SQLAlchemy==0.7.8',
+    'alembic==0.6.7',
     'amqplib==1.0.2',
     'anyjson==0.3.1',
     'argparse==1.2.1',
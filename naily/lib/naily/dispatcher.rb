@@ -90,10 +90,11 @@ module Naily
       Naily.logger.info("'deploy' method called with data: #{data.inspect}")
 
       reporter = Naily::Reporter.new(@producer, data['respond_to'], data['args']['task_uuid'])
-      @orchestrator.watch_provision_progress(reporter, data['args']['task_uuid'], data['args']['deployment_info'])
+      deployment_info = expand_deployment_info(data['args'])
+      @orchestrator.watch_provision_progress(reporter, data['args']['task_uuid'], deployment_info)
 
       begin
-        @orchestrator.deploy(reporter, data['args']['task_uuid'], data['args']['deployment_info'])
+        @orchestrator.deploy(reporter, data['args']['task_uuid'], deployment_info)
         reporter.report('status' => 'ready', 'progress' => 100)
       rescue Timeout::Error
         msg = "Timeout of deployment is exceeded."
@@ -104,7 +105,8 @@ module Naily
 
     def verify_networks(data)
       reporter = Naily::SubtaskReporter.new(@producer, data['respond_to'], data['args']['task_uuid'], data['subtasks'])
-      result = @orchestrator.verify_networks(reporter, data['args']['task_uuid'], data['args']['nodes'])
+      nodes = expand_vlan_ranges(data['args']['nodes'])
+      result = @orchestrator.verify_networks(reporter, data['args']['task_uuid'], nodes)
       report_result(result, reporter)
     end
 
@@ -139,6 +141,28 @@ module Naily
 
     private
 
+    # Nailgun may send common attributes once in 'common_attrs'
+    # instead of merging them into facts of every node.
+    # Common attributes take precedence as they do in nailgun.
+    def expand_deployment_info(args)
+      common_attrs = args['common_attrs']
+      return args['deployment_info'] unless common_attrs
+      args['deployment_info'].map { |node| node.merge(common_attrs) }
+    end
+
+    # Nailgun can send VLAN ids as ranges, e.g. [[100, 1100], [1200, 1300]]
+    def expand_vlan_ranges(nodes)
+      nodes.map do |node|
+        networks = node['networks'].map do |network|
+          vlans = network['vlans'].map do |vlan|
+            vlan.is_a?(Array) ? (vlan[0]..vlan[1]).to_a : vlan
+          end
+          network.merge('vlans' => vlans.flatten)
+        end
+        node.merge('networks' => networks)
+      end
+    end
+
     def report_result(result, reporter)
       result = {} unless result.instance_of?(Hash)
       status = {'status' => 'ready', 'progress' => 100}.merge(result)